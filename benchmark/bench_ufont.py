@@ -0,0 +1,173 @@
+"""
+ufont 主机端基准测试
+
+在 CPython 下运行，使用 benchmark/framebuf.py 代替固件中的 framebuf，使用 mock_display.py 模拟屏幕。
+结果只用于对比同一台电脑上不同版本的耗时，发现热点路径的性能退化，不代表开发板上的实际耗时。
+
+使用方法:
+    python benchmark/bench_ufont.py
+    python benchmark/bench_ufont.py --repeat 20 --output bench_output.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+# framebuf 替代实现优先，ufont 位于仓库根目录
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(1, ROOT_DIR)
+sys.path.insert(2, os.path.join(ROOT_DIR, "tools"))
+
+import bmf  # noqa: E402
+import ufont  # noqa: E402
+from mock_display import MockSSD1306, MockST77XX, MockEPD  # noqa: E402
+
+DEFAULT_FONT = os.path.join(ROOT_DIR, "unifont-14-12917-16.v3.bmf")
+SAMPLE = "你好，世界！Hello 123 ℃"
+
+
+def load_paragraph(length=200):
+    """取 text.txt 中的常用汉字作为长段落"""
+    with open(os.path.join(ROOT_DIR, "text.txt"), encoding="utf-8") as f:
+        chars = f.read()
+    # 跳过开头的 ASCII 与标点
+    return chars[200:200 + length]
+
+
+def bench(name, func, repeat, setup=None):
+    """
+    运行 repeat 次 func，每次运行前调用 setup(不计时)
+    Returns:
+        结果字典，时间单位为毫秒
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(state)
+        times.append((time.perf_counter() - start) * 1000)
+    result = {
+        "name": name,
+        "repeat": repeat,
+        "mean_ms": sum(times) / len(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+    }
+    print("{:<36} mean {:9.3f}ms  min {:9.3f}ms  max {:9.3f}ms".format(
+        name, result["mean_ms"], result["min_ms"], result["max_ms"]))
+    return result
+
+
+def compressed_copy(font_file, directory):
+    """生成与 font_file 版本相同的行字典压缩字体"""
+    with open(font_file, "rb") as f:
+        version = f.read(3)[2]
+    path = os.path.join(directory, "compressed.bmf")
+    bmf.save(bmf.load(font_file), path, version, compressed=True)
+    return path
+
+
+def run(font_file, repeat):
+    results = []
+    font = ufont.BMFont(font_file)
+    oled = MockSSD1306()
+    lcd = MockST77XX()
+    epd = MockEPD()
+
+    # 四种渲染路径: 黑白/彩色(调色板) × 无缩放/缩放
+    for display, label in ((oled, "mono"), (lcd, "rgb565")):
+        for font_size in (font.font_size, 32):
+            results.append(bench(
+                "text/{}/{}px".format(label, font_size),
+                lambda _, d=display, s=font_size: font.text(d, SAMPLE, 0, 0, font_size=s, show=False),
+                repeat))
+    # 彩色屏幕关闭调色板绘制: 逐像素展开为 RGB565(_flatten_byte_data/_RGB565_font_size)，
+    # frame_cache 与 preload(colors=...) 也使用这两条路径
+    flat = ufont.BMFont(font_file, palette_blit=False)
+    for font_size in (flat.font_size, 32):
+        results.append(bench(
+            "text/rgb565/flatten/{}px".format(font_size),
+            lambda _, s=font_size: flat.text(lcd, SAMPLE, 0, 0, font_size=s, show=False),
+            repeat))
+    # 直接写屏: 不经过帧缓冲，同一行连续的字符合并为一次窗口写入
+    results.append(bench(
+        "text/rgb565/direct/{}px".format(font.font_size),
+        lambda _: font.text(lcd, SAMPLE, 0, 0, direct=True),
+        repeat))
+    results.append(bench(
+        "text/epd/reverse/24px",
+        lambda _: font.text(epd, SAMPLE, 0, 0, font_size=24, reverse=True, show=False),
+        repeat))
+
+    # 冷/热查找: 冷为每次新打开字体，热为启用索引与点阵缓存并预热
+    results.append(bench(
+        "lookup/cold",
+        lambda f: f.get_bitmaps(SAMPLE),
+        repeat,
+        setup=lambda: ufont.BMFont(font_file)))
+    warm = ufont.BMFont(font_file, index_cache=64 * 1024, bitmap_cache=8 * 1024)
+    warm.get_bitmaps(SAMPLE)
+    results.append(bench(
+        "lookup/warm",
+        lambda _: [warm.get_bitmap(word) for word in SAMPLE],
+        repeat))
+
+    # 长段落(自动换行)
+    paragraph = load_paragraph()
+    big = MockST77XX(240, 320)
+    results.append(bench(
+        "paragraph/mono/{}chars".format(len(paragraph)),
+        lambda _: font.text(epd, paragraph, 0, 0, auto_wrap=True, show=False),
+        repeat))
+    results.append(bench(
+        "paragraph/rgb565/{}chars".format(len(paragraph)),
+        lambda _: font.text(big, paragraph, 0, 0, auto_wrap=True, show=False),
+        repeat))
+
+    # 字体位于内存中(相当于冻结在固件中的 bytes)
+    with open(font_file, "rb") as f:
+        memory = ufont.BMFont(f.read())
+    results.append(bench(
+        "paragraph/mono/memory/{}chars".format(len(paragraph)),
+        lambda _: memory.text(epd, paragraph, 0, 0, auto_wrap=True, show=False),
+        repeat))
+
+    # 压缩字体: 与原字体对比逐字读取点阵的耗时(含解压)
+    with tempfile.TemporaryDirectory() as directory:
+        for label, path in (("raw", font_file), ("row-dict", compressed_copy(font_file, directory))):
+            plain = ufont.BMFont(path, index_cache=64 * 1024)
+            results.append(bench(
+                "bitmap/{}/{}chars".format(label, len(paragraph)),
+                lambda _, f=plain: [f.get_bitmap(word) for word in paragraph],
+                repeat))
+            results[-1]["file_size"] = os.path.getsize(path)
+            plain.font.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ufont 主机端基准测试")
+    parser.add_argument("--font", default=DEFAULT_FONT, help="字体文件")
+    parser.add_argument("--repeat", type=int, default=10, help="每项运行次数")
+    parser.add_argument("--output", help="以 JSON 格式保存结果")
+    args = parser.parse_args()
+
+    results = run(args.font, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "font": os.path.basename(args.font),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+CPython 下的 framebuf 纯 Python 实现(仅用于主机端基准测试)
+
+只实现 ufont 与驱动用到的部分: MONO_VLSB / MONO_HLSB / RGB565 的 pixel/fill/fill_rect/blit
+"""
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.buf = buffer
+        self._width = width
+        self._height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+        if format == MONO_HLSB:
+            self._line = (self.stride + 7) >> 3
+
+    def _get(self, x, y):
+        buf = self.buf
+        fmt = self.format
+        if fmt == MONO_HLSB:
+            return (buf[y * self._line + (x >> 3)] >> (7 - (x & 7))) & 1
+        if fmt == MONO_VLSB:
+            return (buf[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        if fmt == RGB565:
+            i = (y * self.stride + x) << 1
+            return buf[i] | (buf[i + 1] << 8)
+        raise NotImplementedError(fmt)
+
+    def _set(self, x, y, c):
+        buf = self.buf
+        fmt = self.format
+        if fmt == MONO_HLSB:
+            i = y * self._line + (x >> 3)
+            m = 0x80 >> (x & 7)
+            buf[i] = (buf[i] | m) if c & 1 else (buf[i] & ~m & 0xFF)
+        elif fmt == MONO_VLSB:
+            i = (y >> 3) * self.stride + x
+            m = 1 << (y & 7)
+            buf[i] = (buf[i] | m) if c & 1 else (buf[i] & ~m & 0xFF)
+        elif fmt == RGB565:
+            i = (y * self.stride + x) << 1
+            buf[i] = c & 0xFF
+            buf[i + 1] = (c >> 8) & 0xFF
+        else:
+            raise NotImplementedError(fmt)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        for _y in range(max(y, 0), min(y + h, self._height)):
+            for _x in range(max(x, 0), min(x + w, self._width)):
+                self._set(_x, _y, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self._width, self._height, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for _y in range(max(0, -y), min(fbuf._height, self._height - y)):
+            for _x in range(max(0, -x), min(fbuf._width, self._width - x)):
+                c = fbuf._get(_x, _y)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    self._set(x + _x, y + _y, c)
@@ -0,0 +1,100 @@
+"""
+主机端测试用的模拟屏幕
+
+与 driver 目录下的驱动有相同的属性和方法(width/height/buffer/show/clear/show_region/mark_dirty/show_dirty，ST77XX 另有 write_window)，
+不连接任何硬件，只统计刷新次数和“发送”到屏幕的字节数。
+"""
+import framebuf
+
+
+class MockDisplay(framebuf.FrameBuffer):
+    # 每个像素占用的位数
+    BITS = 1
+    FORMAT = framebuf.MONO_HLSB
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(width * height * self.BITS // 8)
+        super().__init__(self.buffer, width, height, self.FORMAT)
+        self.dirty = None
+        # 统计
+        self.shows = 0
+        self.transferred = 0
+
+    def clear(self):
+        self.fill(0)
+
+    def show(self):
+        self.shows += 1
+        self.transferred += len(self.buffer)
+        self.dirty = None
+
+    def show_region(self, x, y, w, h):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        self.shows += 1
+        self.transferred += self.region_bytes(x0, y0, x1, y1)
+
+    def region_bytes(self, x0, y0, x1, y1):
+        return (x1 - x0) * (y1 - y0) * self.BITS // 8
+
+    def mark_dirty(self, x, y, w, h):
+        # 只统计传输量，保存合并后的外接矩形 (x, y, w, h) 即可，裁剪由 show_region 完成
+        if self.dirty is not None:
+            _x, _y, _w, _h = self.dirty
+            w = max(x + w, _x + _w) - min(x, _x)
+            h = max(y + h, _y + _h) - min(y, _y)
+            x = min(x, _x)
+            y = min(y, _y)
+        self.dirty = (x, y, w, h)
+
+    def show_dirty(self):
+        if self.dirty is not None:
+            region = self.dirty
+            self.dirty = None
+            self.show_region(*region)
+
+
+class MockSSD1306(MockDisplay):
+    """SSD1306: MONO_VLSB，纵向按页(8 像素)传输"""
+    FORMAT = framebuf.MONO_VLSB
+
+    def __init__(self, width=128, height=64):
+        super().__init__(width, height)
+
+    def region_bytes(self, x0, y0, x1, y1):
+        return (x1 - x0) * (((y1 - 1) >> 3) - (y0 >> 3) + 1)
+
+
+class MockST77XX(MockDisplay):
+    """ST7735/ST7789: RGB565"""
+    BITS = 16
+    FORMAT = framebuf.RGB565
+
+    def __init__(self, width=240, height=240):
+        super().__init__(width, height)
+
+    def write_window(self, x, y, w, h, data, stride=None):
+        """直接写屏，只统计窗口内的字节数"""
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        self.shows += 1
+        self.transferred += self.region_bytes(x0, y0, x1, y1)
+
+
+class MockEPD(MockDisplay):
+    """1.54 寸墨水屏: MONO_HLSB，横向按 8 像素对齐传输"""
+
+    def __init__(self, width=200, height=200):
+        super().__init__(width, height)
+
+    def clear(self):
+        self.fill(1)
+
+    def region_bytes(self, x0, y0, x1, y1):
+        return (((x1 + 7) >> 3) - (x0 >> 3)) * (y1 - y0)
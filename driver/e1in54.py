@@ -2,9 +2,18 @@
 from micropython import const
 from time import sleep_ms
 import ustruct
-from machine import Pin
+from machine import Pin, idle
 import framebuf
 
+# async refresh (ashow, Scheduler, ...) needs asyncio, synchronous use works without it
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None
+
 # Display resolution
 EPD_WIDTH = const(200)
 EPD_HEIGHT = const(200)
@@ -39,7 +48,8 @@ class EPD(framebuf.FrameBuffer):
     LUT_PARTIAL_UPDATE = bytearray(
         b'\x10\x18\x18\x08\x18\x18\x08\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x13\x14\x44\x12\x00\x00\x00\x00\x00\x00')
 
-    def __init__(self, spi, cs, dc, rst, busy):
+    # full_refresh_every: number of partial refreshes before a full refresh clears ghosting, 0 disables it
+    def __init__(self, spi, cs, dc, rst, busy, full_refresh_every=10):
         self.spi = spi
         self.cs = Pin(cs, Pin.OUT, value=1)
         self.dc = Pin(dc, Pin.OUT, value=0)
@@ -49,16 +59,150 @@ class EPD(framebuf.FrameBuffer):
         self.height = EPD_HEIGHT
         self.pages = self.height // 8
         self.buffer = bytearray(self.width * self.pages)
+        # one row of frame memory, reused by clear_frame_memory
+        self._row = bytearray(self.width // 8)
+        # frame memory window [x0, y0, x1, y1) still to be refreshed, x0/x1 on byte boundaries, None when clean
+        self.dirty = None
+        # show uses the LUT chosen by set_refresh, show_region/show_dirty always use the partial update LUT
+        # and fall back to a full refresh after full_refresh_every partial refreshes to clear ghosting
+        self.full_update = True
+        self.lut_partial = False
+        self.full_refresh_every = full_refresh_every
+        self.partial_count = 0
+        # BUSY falling edge interrupt, waits no longer poll every 100ms; fall back to polling without IRQ support
+        self.busy_flag = asyncio.ThreadSafeFlag() if hasattr(asyncio, "ThreadSafeFlag") else None
+        try:
+            self.busy.irq(self._busy_irq, Pin.IRQ_FALLING)
+            self.busy_irq = True
+        except (AttributeError, TypeError, ValueError):
+            self.busy_irq = False
         super().__init__(self.buffer, self.width, self.height,
                          framebuf.MONO_HLSB)
         self.init()
 
+    # clear the buffer in place, rebinding self.buffer would detach it from the FrameBuffer
     def clear(self):
-        self.buffer = (b'\xff' * self.width * self.pages)
+        self.fill(1)
 
     def show(self):
+        self.use_lut(not self.full_update)
+        self.set_frame_memory(self.buffer, 0, 0, 200, 200)
+        self.display_frame()
+        self.sync_frame()
+
+    # full refresh with the full update LUT, also used periodically by show_region
+    def full_refresh(self):
+        self.use_lut(False)
         self.set_frame_memory(self.buffer, 0, 0, 200, 200)
         self.display_frame()
+        self.sync_frame()
+
+    # display_frame switches to the other RAM bank, write the same frame to it so that both banks match
+    def sync_frame(self):
+        self.set_frame_memory(self.buffer, 0, 0, 200, 200)
+        self.dirty = None
+        self.partial_count = self.partial_count + 1 if self.lut_partial else 0
+
+    # partial refresh of the given window, x is aligned to multiples of 8
+    def show_region(self, x, y, w, h):
+        window = self.align_window(x, y, w, h)
+        if window is not None:
+            self.refresh_window(*window)
+
+    # partial refresh of an aligned window, afterwards both RAM banks hold the buffer contents
+    def refresh_window(self, x0, y0, x1, y1):
+        if self.full_refresh_due():
+            self.full_refresh()
+            return
+        self.use_lut(True)
+        self.write_window(x0, y0, x1, y1)
+        self.display_frame()
+        self.write_window(x0, y0, x1, y1)
+        self.partial_count += 1
+
+    # [x0, y0, x1, y1) clipped to the panel with x aligned to multiples of 8, None if empty
+    def align_window(self, x, y, w, h):
+        x0 = max(x, 0) & ~7
+        x1 = min((x + w + 7) & ~7, self.width)
+        y0 = max(y, 0)
+        y1 = min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def full_refresh_due(self):
+        return 0 < self.full_refresh_every <= self.partial_count
+
+    # load the partial or full update LUT if it is not loaded yet
+    def use_lut(self, partial):
+        if partial != self.lut_partial:
+            self.set_lut(self.LUT_PARTIAL_UPDATE if partial else self.LUT_FULL_UPDATE)
+            self.lut_partial = partial
+
+    # async variants: the panel update is started and the BUSY pin is polled without blocking other tasks
+    async def ashow(self):
+        self.use_lut(not self.full_update)
+        self.set_frame_memory(self.buffer, 0, 0, 200, 200)
+        await self.adisplay_frame()
+        self.sync_frame()
+
+    async def ashow_region(self, x, y, w, h):
+        window = self.align_window(x, y, w, h)
+        if window is not None:
+            await self.arefresh_window(*window)
+
+    async def arefresh_window(self, x0, y0, x1, y1):
+        if self.full_refresh_due():
+            self.use_lut(False)
+            self.set_frame_memory(self.buffer, 0, 0, 200, 200)
+            await self.adisplay_frame()
+            self.sync_frame()
+            return
+        self.use_lut(True)
+        self.write_window(x0, y0, x1, y1)
+        await self.adisplay_frame()
+        self.write_window(x0, y0, x1, y1)
+        self.partial_count += 1
+
+    async def ashow_dirty(self):
+        window = self.dirty
+        if window is not None:
+            self.dirty = None
+            await self.arefresh_window(*window)
+
+    # send rows [y0, y1) of the buffer between columns [x0, x1) to the frame memory
+    def write_window(self, x0, y0, x1, y1):
+        self.set_memory_area(x0, y0, x1 - 1, y1 - 1)
+        self.set_memory_pointer(x0, y0)
+        self._command(WRITE_RAM)
+        line = self.width // 8
+        buffer = memoryview(self.buffer)
+        self.dc.value(1)
+        self.cs.value(0)
+        for _y in range(y0 * line, y1 * line, line):
+            self.spi.write(buffer[_y + (x0 >> 3):_y + (x1 >> 3)])
+        self.cs.value(1)
+
+    # grow the dirty window by a drawn rectangle, widened to whole bytes the way write_window sends it
+    def mark_dirty(self, x, y, w, h):
+        window = self.align_window(x, y, w, h)
+        if window is None:
+            return
+        dirty = self.dirty
+        if dirty is None:
+            self.dirty = list(window)
+            return
+        for i in (0, 1):
+            if window[i] < dirty[i]:
+                dirty[i] = window[i]
+            if window[i + 2] > dirty[i + 2]:
+                dirty[i + 2] = window[i + 2]
+
+    def show_dirty(self):
+        window = self.dirty
+        if window is not None:
+            self.dirty = None
+            self.refresh_window(*window)
 
     def _command(self, command, data=None):
         self.dc.value(0)
@@ -77,6 +221,15 @@ class EPD(framebuf.FrameBuffer):
 
     def init(self):
         self.reset()
+        self._setup()
+
+    # same as init() but waits for the reset without blocking the event loop
+    async def ainit(self):
+        await self.areset()
+        self._setup()
+
+    # controller registers written after every reset
+    def _setup(self):
         self._command(DRIVER_OUTPUT_CONTROL)
         self._data(bytearray([(EPD_HEIGHT - 1) & 0xFF]))
         self._data(bytearray([((EPD_HEIGHT - 1) >> 8) & 0xFF]))
@@ -88,10 +241,33 @@ class EPD(framebuf.FrameBuffer):
         self._command(DATA_ENTRY_MODE_SETTING, b'\x03')  # X increment Y increment
         # self._command(DATA_ENTRY_MODE_SETTING, b'\x07') # X increment Y increment
         self.set_lut(self.LUT_FULL_UPDATE)
+        self.lut_partial = False
 
+    def _busy_irq(self, pin):
+        if self.busy_flag is not None:
+            self.busy_flag.set()
+
+    # with the BUSY interrupt the CPU idles until the falling edge wakes it up
     def wait_until_idle(self):
+        if not self.busy_irq:
+            while self.busy.value() == 1:
+                sleep_ms(100)
+            return
+        while self.busy.value() == 1:
+            idle()
+
+    # waits on the BUSY interrupt flag, `interval` is the polling period without interrupts
+    # and the timeout that guards against a missed edge with them
+    async def await_idle(self, interval=10):
+        if not self.busy_irq or self.busy_flag is None:
+            while self.busy.value() == 1:
+                await asyncio.sleep_ms(interval)
+            return
         while self.busy.value() == 1:
-            sleep_ms(100)
+            try:
+                await asyncio.wait_for_ms(self.busy_flag.wait(), interval * 10)
+            except asyncio.TimeoutError:
+                pass
 
     def reset(self):
         self.rst.value(0)
@@ -99,6 +275,12 @@ class EPD(framebuf.FrameBuffer):
         self.rst.value(1)
         sleep_ms(200)
 
+    async def areset(self):
+        self.rst.value(0)
+        await asyncio.sleep_ms(200)
+        self.rst.value(1)
+        await asyncio.sleep_ms(200)
+
     def set_lut(self, lut):
         self._command(WRITE_LUT_REGISTER, lut)
 
@@ -122,22 +304,35 @@ class EPD(framebuf.FrameBuffer):
         self.set_memory_pointer(x, y)
         self._command(WRITE_RAM, image)
 
-    # replace the frame memory with the specified color
+    # replace the frame memory with the specified color byte (0xFF white, 0x00 black)
+    # the preallocated row is streamed once per line under a single CS
     def clear_frame_memory(self, color):
         self.set_memory_area(0, 0, self.width - 1, self.height - 1)
         self.set_memory_pointer(0, 0)
         self._command(WRITE_RAM)
-        # send the color data
-        for i in range(0, self.width // 8 * self.height):
-            # self._data(bytearray([color]))
-            self._data(bytearray(color))
+        row = self._row
+        for i in range(len(row)):
+            row[i] = color
+        self.dc.value(1)
+        self.cs.value(0)
+        for _ in range(self.height):
+            self.spi.write(row)
+        self.cs.value(1)
 
     # draw the current frame memory and switch to the next memory area
     def display_frame(self):
+        self.start_update()
+        self.wait_until_idle()
+
+    async def adisplay_frame(self):
+        self.start_update()
+        await self.await_idle()
+
+    # start the panel update without waiting for BUSY
+    def start_update(self):
         self._command(DISPLAY_UPDATE_CONTROL_2, b'\xC4')
         self._command(MASTER_ACTIVATION)
         self._command(TERMINATE_FRAME_READ_WRITE)
-        self.wait_until_idle()
 
     # specify the memory area for data R/W
     def set_memory_area(self, x_start, y_start, x_end, y_end):
@@ -153,12 +348,67 @@ class EPD(framebuf.FrameBuffer):
         # x point must be the multiple of 8 or the last 3 bits will be ignored
         self._data(bytearray([(x >> 3) & 0xFF]))
         self._command(SET_RAM_Y_ADDRESS_COUNTER, ustruct.pack("<H", y))
-        self.wait_until_idle()
 
     # to wake call reset() or init()
+    # BUSY stays high in deep sleep, so do not wait for it here
     def sleep(self):
-        self._command(DEEP_SLEEP_MODE, b'\x01')  # enter deep sleep A0=1, A0=0 power on
         self.wait_until_idle()
+        self._command(DEEP_SLEEP_MODE, b'\x01')  # enter deep sleep A0=1, A0=0 power on
+
+    async def asleep(self):
+        await self.await_idle()
+        self._command(DEEP_SLEEP_MODE, b'\x01')
 
     def set_refresh(self, full_update=True):
-        self.set_lut(self.LUT_FULL_UPDATE) if full_update else self.set_lut(self.LUT_PARTIAL_UPDATE)
+        self.full_update = full_update
+        self.use_lut(not full_update)
+
+
+class Scheduler:
+    """
+    Coalesces e-paper refreshes and puts the panel to sleep in between.
+
+    request() waits delay_ms so that several text() calls end up in one partial refresh of the
+    merged dirty region, then the panel enters deep sleep until the next request. Suited to battery
+    powered labels that change now and then.
+
+    Usage:
+        scheduler = Scheduler(epd)
+        asyncio.create_task(scheduler.run())
+        font.text(epd, "12.80", 0, 0, show=False)
+        scheduler.request()
+    """
+
+    # epd: EPD instance, delay_ms: time to collect drawing before a refresh, sleep: deep sleep after each refresh
+    def __init__(self, epd, delay_ms=500, sleep=True):
+        self.epd = epd
+        self.delay_ms = delay_ms
+        self.sleep = sleep
+        self.sleeping = False
+        self.event = asyncio.Event()
+
+    # ask for a refresh, calls within delay_ms are merged
+    def request(self):
+        self.event.set()
+
+    async def run(self):
+        while True:
+            await self.event.wait()
+            await asyncio.sleep_ms(self.delay_ms)
+            self.event.clear()
+            await self.flush()
+
+    # refresh the dirty region now
+    async def flush(self):
+        epd = self.epd
+        if epd.dirty is None:
+            return
+        if self.sleeping:
+            # waking up needs a hardware reset which does not keep the frame memory, rewrite the whole panel
+            await epd.ainit()
+            epd.dirty = [0, 0, epd.width, epd.height]
+            self.sleeping = False
+        await epd.ashow_dirty()
+        if self.sleep:
+            await epd.asleep()
+            self.sleeping = True
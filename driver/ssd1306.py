@@ -3,6 +3,15 @@
 from micropython import const
 import framebuf
 
+# async refresh (ashow, ...) needs asyncio, synchronous refresh works without it
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None
+
 # register definitions
 SET_CONTRAST = const(0x81)
 SET_ENTIRE_ON = const(0xA4)
@@ -33,6 +42,8 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        # dirty columns and pages [x0, p0, x1, p1] (inclusive), None when nothing needs a refresh
+        self.dirty = None
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
@@ -93,20 +104,85 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_SEG_REMAP | (rotate & 1))
 
     def show(self):
-        x0 = 0
-        x1 = self.width - 1
-        if self.width != 128:
-            # narrow displays use centred columns
-            col_offset = (128 - self.width) // 2
-            x0 += col_offset
-            x1 += col_offset
+        self.set_window(0, 0, self.width - 1, self.pages - 1)
+        self.write_data(self.buffer)
+        self.dirty = None
+
+    def show_region(self, x, y, w, h):
+        # refresh only the given region, rounded out to whole pages (8 rows) vertically
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        p0 = max(y, 0) >> 3
+        p1 = (min(y + h, self.height) - 1) >> 3
+        if x1 < x0 or p1 < p0:
+            return
+        self.write_pages(x0, p0, x1, p1)
+
+    def set_window(self, x0, p0, x1, p1):
+        # set the column and page address window (inclusive)
+        # narrow displays use centred columns
+        col_offset = (128 - self.width) // 2 if self.width != 128 else 0
         self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
+        self.write_cmd(x0 + col_offset)
+        self.write_cmd(x1 + col_offset)
         self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        self.write_cmd(p0)
+        self.write_cmd(p1)
+
+    def write_pages(self, x0, p0, x1, p1):
+        # send columns x0..x1 of pages p0..p1
+        self.set_window(x0, p0, x1, p1)
+        # the address auto-increments inside the window, so each page is one write
+        buffer = memoryview(self.buffer)
+        for page in range(p0 * self.width, (p1 + 1) * self.width, self.width):
+            self.write_data(buffer[page + x0:page + x1 + 1])
+
+    async def ashow(self):
+        # async show, yields after every page
+        self.dirty = None
+        await self.ashow_region(0, 0, self.width, self.height)
+
+    async def ashow_region(self, x, y, w, h):
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        p0 = max(y, 0) >> 3
+        p1 = (min(y + h, self.height) - 1) >> 3
+        if x1 < x0 or p1 < p0:
+            return
+        self.set_window(x0, p0, x1, p1)
+        buffer = memoryview(self.buffer)
+        for page in range(p0 * self.width, (p1 + 1) * self.width, self.width):
+            self.write_data(buffer[page + x0:page + x1 + 1])
+            await asyncio.sleep_ms(0)
+
+    async def ashow_dirty(self):
+        if self.dirty is not None:
+            x0, p0, x1, p1 = self.dirty
+            self.dirty = None
+            await self.ashow_region(x0, p0 << 3, x1 - x0 + 1, (p1 - p0 + 1) << 3)
+
+    def mark_dirty(self, x, y, w, h):
+        # GDDRAM is written in pages (8 rows), so store columns and pages and merge with the previous region
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        p0 = max(y, 0) >> 3
+        p1 = (min(y + h, self.height) - 1) >> 3
+        if x1 < x0 or p1 < p0:
+            return
+        if self.dirty is None:
+            self.dirty = [x0, p0, x1, p1]
+            return
+        dirty = self.dirty
+        dirty[0] = x0 if x0 < dirty[0] else dirty[0]
+        dirty[1] = p0 if p0 < dirty[1] else dirty[1]
+        dirty[2] = x1 if x1 > dirty[2] else dirty[2]
+        dirty[3] = p1 if p1 > dirty[3] else dirty[3]
+
+    def show_dirty(self):
+        if self.dirty is not None:
+            x0, p0, x1, p1 = self.dirty
+            self.dirty = None
+            self.write_pages(x0, p0, x1, p1)
 
     def clear(self):
         self.fill(0)
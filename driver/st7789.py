@@ -14,6 +14,19 @@ ST77XX 通用驱动 v2.0.1
     ST7735(spi, rst=10, dc=6, cs=7, bl=11, width=160, height=80, rotate=1)  # 直插横屏显示
     ST7735(spi, rst=10, dc=6, cs=7, bl=11, width=160, height=80, rotate=0)  # 直插竖屏显示
 
+无缓冲模式:
+    指定 buffered=False 后不申请整屏缓冲区，只保留一行(width * 2 byte)，240*320 的屏幕也只需要不到 1Kbyte；
+    fill/fill_rect 直接写屏，ufont 会把每个字符渲染为 RGB565 小块后通过 write_window 直接发送，
+    其他 FrameBuffer 绘图方法不可用，show 等刷新方法不再需要:
+        d = ST7789(spi, rst=6, dc=5, bl=4, width=240, height=320, rotate=0, buffered=False)
+
+双缓冲:
+    指定 double_buffer=True 后额外申请一块同样大小的前缓冲，show/swap 把绘制好的内容复制到前缓冲后发送，
+    固件支持 _thread 时由后台线程发送，发送期间可以继续绘制下一帧，内存占用翻倍；
+    ashow/ashow_region 同样从前缓冲发送，异步等待期间绘制不会造成撕裂:
+        d = ST7789(spi, rst=6, dc=5, bl=4, width=240, height=240, rotate=0, double_buffer=True)
+        d.fill(0); font.text(d, "...", 0, 0, show=False); d.swap()
+
 偏移问题:
     默认提供了三种屏幕的偏移数据(160*80, 160*128, 240*240)，偏移不正确或者没有预设，请自行指定偏移，例如:
         ST7789(spi, rst=6, dc=5, bl=4, width=240, height=135, rotate=0, offset=(0, 0, 240, 135))
@@ -44,6 +57,20 @@ import machine
 import framebuf
 from micropython import const
 
+# 异步刷新(ashow 等)，固件没有 asyncio 时不可用，同步刷新不受影响
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
 SWRESET = const(0x01)
 SLPOUT = const(0x11)
 NORON = const(0x13)
@@ -96,7 +123,7 @@ BLACK = color(0, 0, 0)
 
 class ST77XX(framebuf.FrameBuffer):
     def __init__(self, spi, rst, dc, cs=None, bl=None, width=80, height=160, offset=(0, 0, 0, 0), rotate=1,
-                 rgb=True, inverse=False, **kwargs):
+                 rgb=True, inverse=False, double_buffer=False, buffered=True, **kwargs):
         """
         :param spi:
         :param rst:
@@ -108,6 +135,8 @@ class ST77XX(framebuf.FrameBuffer):
         :param offset: 偏移
         :param rotate: 旋转
         :param rgb: RGB 色彩模式
+        :param double_buffer: 双缓冲
+        :param buffered: 使用整屏缓冲区，False 为无缓冲模式
         """
         # 根据方向自动设置偏移
         self.rotate = rotate
@@ -130,9 +159,30 @@ class ST77XX(framebuf.FrameBuffer):
             self.bl = machine.PWM(machine.Pin(bl), duty=1023)
         self.auto_offset() if self.offset == (0, 0, 0, 0) else 0
 
+        # 需要刷新的窗口 [x0, y0, x1, y1](含两端，已限制在屏幕内)，为 None 表示没有需要刷新的内容
+        self.dirty = None
+
         gc.collect()
-        self.buffer = bytearray(self.height * self.width * 2)
-        super().__init__(self.buffer, self.width, self.height, framebuf.RGB565)
+        if buffered:
+            self.buffer = bytearray(self.height * self.width * 2)
+            super().__init__(self.buffer, self.width, self.height, framebuf.RGB565)
+        else:
+            # 无缓冲模式: FrameBuffer 只覆盖一行，用来生成 fill/fill_rect 发送的数据
+            self.buffer = None
+            self._row = bytearray(self.width * 2)
+            super().__init__(self._row, self.width, 1, framebuf.RGB565)
+            double_buffer = False
+
+        # 双缓冲
+        #   绘制始终在 self.buffer(后缓冲)上进行，前缓冲只由发送方使用；
+        #   done 在发送期间被占用，request 由 swap 释放以通知后台线程发送
+        self.front = bytearray(len(self.buffer)) if double_buffer else None
+        self.done = None
+        if double_buffer and _thread is not None:
+            self.done = _thread.allocate_lock()
+            self.request = _thread.allocate_lock()
+            self.request.acquire()
+            _thread.start_new_thread(self._sender, ())
         self.init()
         self.set_windows()
         self.clear()
@@ -154,10 +204,10 @@ class ST77XX(framebuf.FrameBuffer):
         设置窗口
         :return:
         """
-        x_start = x_start if x_start else self.offset[0]
-        y_start = y_start if y_start else self.offset[1]
-        x_end = x_end if x_end else self.offset[2]
-        y_end = y_end if y_end else self.offset[3]
+        x_start = x_start if x_start is not None else self.offset[0]
+        y_start = y_start if y_start is not None else self.offset[1]
+        x_end = x_end if x_end is not None else self.offset[2]
+        y_end = y_end if y_end is not None else self.offset[3]
 
         self.write_cmd(CASET)
         self.write_data(bytearray([x_start >> 8, x_start & 0xff, x_end >> 8, x_end & 0xff]))
@@ -270,10 +320,260 @@ class ST77XX(framebuf.FrameBuffer):
     def show(self):
         """
         显示
+            双缓冲时等同于 swap
         :return:
         """
+        if self.front is not None:
+            self.swap()
+            return
+        if self.buffer is None:
+            # 无缓冲模式下内容已经写到屏幕上
+            self.dirty = None
+            return
         self.set_windows()  # 如果没有这行就会偏移
         self.write_data(self.buffer)
+        self.dirty = None
+
+    def swap(self):
+        """
+        交换缓冲区(需要 double_buffer=True)
+            等待上一帧发送完成后把后缓冲复制到前缓冲再发送，
+            有后台线程时立即返回，可以继续在 self.buffer 上绘制下一帧
+        :return:
+        """
+        self.wait()
+        self.front[:] = self.buffer
+        self.dirty = None
+        if self.done is None:
+            self._send_front()
+        else:
+            self.done.acquire()
+            self.request.release()
+
+    def wait(self):
+        """
+        等待后台线程发送完成，之后才能使用 SPI
+        :return:
+        """
+        if self.done is not None:
+            self.done.acquire()
+            self.done.release()
+
+    def _send_front(self):
+        self.set_windows()
+        self.write_data(self.front)
+
+    def _sender(self):
+        # 后台发送线程
+        while True:
+            self.request.acquire()
+            try:
+                self._send_front()
+            finally:
+                self.done.release()
+
+    def show_region(self, x, y, w, h):
+        """
+        只刷新指定区域
+            通过 CASET/RASET 设置窗口后逐行发送该区域的数据
+        :param x: 左上角 x
+        :param y: 左上角 y
+        :param w: 宽度
+        :param h: 高度
+        :return:
+        """
+        x0 = x if x > 0 else 0
+        y0 = y if y > 0 else 0
+        x1 = (x + w if x + w < self.width else self.width) - 1
+        y1 = (y + h if y + h < self.height else self.height) - 1
+        if x1 < x0 or y1 < y0 or self.buffer is None:
+            return
+        self.wait()
+        self.set_windows(self.offset[0] + x0, self.offset[1] + y0, self.offset[0] + x1, self.offset[1] + y1)
+
+        buffer = memoryview(self.buffer)
+        line = self.width * 2
+        self.dc(1)
+        self.cs(0)
+        if x0 == 0 and x1 == self.width - 1:
+            # 整行连续，一次发送
+            self.spi.write(buffer[y0 * line:(y1 + 1) * line])
+        else:
+            for _y in range(y0 * line, (y1 + 1) * line, line):
+                self.spi.write(buffer[_y + x0 * 2:_y + (x1 + 1) * 2])
+        self.cs(1)
+
+    async def await_done(self, interval=1):
+        """
+        异步等待后台线程发送完成，等待期间其他协程可以继续运行
+        :param interval: 查询间隔(ms)
+        :return:
+        """
+        if self.done is not None:
+            while not self.done.acquire(0):
+                await asyncio.sleep_ms(interval)
+            self.done.release()
+
+    async def ashow(self, rows=16):
+        """
+        异步显示
+            每发送 rows 行让出一次，发送期间其他协程可以继续运行；
+            双缓冲且有后台线程时复制到前缓冲(swap)后由后台线程发送，只异步等待发送完成
+        :param rows: 每次发送的行数
+        :return:
+        """
+        if self.done is not None:
+            await self.await_done()
+            self.swap()
+            await self.await_done()
+            return
+        self.dirty = None
+        await self.ashow_region(0, 0, self.width, self.height, rows)
+
+    async def ashow_region(self, x, y, w, h, rows=16):
+        """
+        异步刷新指定区域，参数同 show_region
+            双缓冲时先把区域所在的行复制到前缓冲再从前缓冲发送，让出期间在后缓冲上绘制不会影响未发送的行
+        :param rows: 每次发送的行数
+        :return:
+        """
+        x0 = x if x > 0 else 0
+        y0 = y if y > 0 else 0
+        x1 = (x + w if x + w < self.width else self.width) - 1
+        y1 = (y + h if y + h < self.height else self.height) - 1
+        if x1 < x0 or y1 < y0 or self.buffer is None:
+            return
+        await self.await_done()
+        self.set_windows(self.offset[0] + x0, self.offset[1] + y0, self.offset[0] + x1, self.offset[1] + y1)
+
+        line = self.width * 2
+        if self.front is not None:
+            buffer = memoryview(self.front)
+            buffer[y0 * line:(y1 + 1) * line] = memoryview(self.buffer)[y0 * line:(y1 + 1) * line]
+        else:
+            buffer = memoryview(self.buffer)
+        for _start in range(y0, y1 + 1, rows):
+            _end = min(_start + rows, y1 + 1)
+            self.dc(1)
+            self.cs(0)
+            if x0 == 0 and x1 == self.width - 1:
+                self.spi.write(buffer[_start * line:_end * line])
+            else:
+                for _y in range(_start * line, _end * line, line):
+                    self.spi.write(buffer[_y + x0 * 2:_y + (x1 + 1) * 2])
+            self.cs(1)
+            await asyncio.sleep_ms(0)
+
+    async def ashow_dirty(self, rows=16):
+        """
+        异步刷新标记过的区域
+        :return:
+        """
+        if self.dirty is not None:
+            x0, y0, x1, y1 = self.dirty
+            self.dirty = None
+            await self.ashow_region(x0, y0, x1 - x0 + 1, y1 - y0 + 1, rows)
+
+    def write_window(self, x, y, w, h, data, stride=None):
+        """
+        把 RGB565 数据直接写到屏幕的指定区域，不经过缓冲区
+            只有一次 CASET/RASET/RAMWR，超出屏幕的部分会被裁剪，数据连续时一次发送
+        :param x: 左上角 x
+        :param y: 左上角 y
+        :param w: 宽度
+        :param h: 高度
+        :param data: 存储方式与 FrameBuffer(RGB565) 相同
+        :param stride: data 每行的像素数，默认为 w；可以只发送较宽缓冲区的左侧部分
+        :return:
+        """
+        stride = stride or w
+        x0 = x if x > 0 else 0
+        y0 = y if y > 0 else 0
+        x1 = (x + w if x + w < self.width else self.width) - 1
+        y1 = (y + h if y + h < self.height else self.height) - 1
+        if x1 < x0 or y1 < y0:
+            return
+        self.wait()
+        self.set_windows(self.offset[0] + x0, self.offset[1] + y0, self.offset[0] + x1, self.offset[1] + y1)
+
+        data = memoryview(data)
+        line = stride * 2
+        self.dc(1)
+        self.cs(0)
+        if x0 == x and x1 == x + w - 1 and stride == w:
+            self.spi.write(data[(y0 - y) * line:(y1 - y + 1) * line])
+        else:
+            for _y in range((y0 - y) * line + (x0 - x) * 2, (y1 - y + 1) * line, line):
+                self.spi.write(data[_y:_y + (x1 - x0 + 1) * 2])
+        self.cs(1)
+
+    def fill(self, c):
+        """
+        填充，无缓冲模式下直接写屏
+        :return:
+        """
+        if self.buffer is not None:
+            super().fill(c)
+            return
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        """
+        填充矩形，无缓冲模式下直接写屏
+        :return:
+        """
+        if self.buffer is not None:
+            super().fill_rect(x, y, w, h, c)
+            return
+        x0 = x if x > 0 else 0
+        y0 = y if y > 0 else 0
+        x1 = (x + w if x + w < self.width else self.width) - 1
+        y1 = (y + h if y + h < self.height else self.height) - 1
+        if x1 < x0 or y1 < y0:
+            return
+        super().fill_rect(0, 0, x1 - x0 + 1, 1, c)
+        self.set_windows(self.offset[0] + x0, self.offset[1] + y0, self.offset[0] + x1, self.offset[1] + y1)
+        row = memoryview(self._row)[:(x1 - x0 + 1) * 2]
+        self.dc(1)
+        self.cs(0)
+        for _ in range(y1 - y0 + 1):
+            self.spi.write(row)
+        self.cs(1)
+
+    def mark_dirty(self, x, y, w, h):
+        """
+        记录需要刷新的区域
+            与之前的区域合并为一个窗口，坐标与 CASET/RASET 一样包含两端，show_dirty 只需设置一次窗口
+        :return:
+        """
+        x0 = x if x > 0 else 0
+        y0 = y if y > 0 else 0
+        x1 = (x + w if x + w < self.width else self.width) - 1
+        y1 = (y + h if y + h < self.height else self.height) - 1
+        if x1 < x0 or y1 < y0:
+            return
+        dirty = self.dirty
+        if dirty is None:
+            self.dirty = [x0, y0, x1, y1]
+            return
+        if x0 < dirty[0]:
+            dirty[0] = x0
+        if y0 < dirty[1]:
+            dirty[1] = y0
+        if x1 > dirty[2]:
+            dirty[2] = x1
+        if y1 > dirty[3]:
+            dirty[3] = y1
+
+    def show_dirty(self):
+        """
+        只刷新记录的窗口
+        :return:
+        """
+        if self.dirty is not None:
+            x0, y0, x1, y1 = self.dirty
+            self.dirty = None
+            self.show_region(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
 
     def circle(self, center, radius, c=color(255, 255, 255), section=100):
         """
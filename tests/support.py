@@ -0,0 +1,114 @@
+"""
+测试用的公共设置
+
+CPython 下使用 benchmark/framebuf.py 代替固件中的 framebuf，并把仓库根目录和 driver 目录加入模块搜索路径，
+同时提供 machine/micropython 模块和 time.sleep_ms、asyncio.sleep_ms 等函数的替代实现，驱动可以在电脑上运行；
+在开发板上运行时使用固件自带的模块，ufont.py 和字体文件需要与测试文件放在同一目录。
+"""
+import sys
+import time
+
+try:
+    import framebuf  # noqa: F401
+    ROOT_DIR = "."
+except ImportError:
+    import os
+    import types
+
+    TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+    ROOT_DIR = os.path.dirname(TESTS_DIR)
+    sys.path.insert(0, os.path.join(ROOT_DIR, "benchmark"))
+    sys.path.insert(1, ROOT_DIR)
+    sys.path.insert(2, os.path.join(ROOT_DIR, "driver"))
+
+    # 驱动中的复位、上电等待不需要真的等待
+    time.sleep_ms = lambda ms: None
+    time.sleep_us = lambda us: None
+
+    import asyncio
+    asyncio.sleep_ms = lambda ms: asyncio.sleep(ms / 1000)
+
+    class Pin:
+        IN = 0
+        OUT = 1
+        PULL_UP = 1
+        PULL_DOWN = 2
+        IRQ_FALLING = 4
+        IRQ_RISING = 8
+
+        def __init__(self, id, mode=IN, pull=None, value=0):
+            self.id = id
+            self._value = value
+            self.handler = None
+
+        def __call__(self, value=None):
+            return self.value(value)
+
+        def value(self, value=None):
+            if value is None:
+                return self._value
+            self._value = value
+
+        def irq(self, handler=None, trigger=IRQ_FALLING):
+            self.handler = handler
+
+    class PWM:
+        def __init__(self, pin, freq=1000, duty=0):
+            self.pin = pin
+
+        def freq(self, value=None):
+            pass
+
+        def duty_u16(self, value=None):
+            pass
+
+    machine = types.ModuleType("machine")
+    machine.Pin = Pin
+    machine.PWM = PWM
+    machine.idle = lambda: None
+    sys.modules["machine"] = machine
+
+    import struct
+    sys.modules["ustruct"] = struct
+
+    micropython = types.ModuleType("micropython")
+    micropython.const = lambda value: value
+
+    def _no_emitter(func):
+        # 与没有 viper 代码发射器的固件相同，ufont 回退到纯 Python 实现
+        raise SyntaxError("invalid micropython decorator")
+
+    micropython.viper = micropython.native = _no_emitter
+    sys.modules["micropython"] = micropython
+
+FONT = ROOT_DIR + "/unifont-14-12917-16.v3.bmf"
+
+
+class MockSPI:
+    """
+    模拟 SPI
+        记录每次 write 的数据和当时 DC 引脚的电平(需要指定 dc)；
+        delay 不为 0 时较大的传输会等待 delay 秒，期间检查数据没有被修改，同时检查没有两次传输同时进行
+    """
+
+    def __init__(self, delay=0):
+        self.writes = []
+        self.dc = None
+        self.delay = delay
+        self.active = 0
+
+    def write(self, buf):
+        assert self.active == 0, "SPI 正在被另一个线程使用"
+        self.active += 1
+        try:
+            data = bytes(buf)
+            if self.delay and len(data) > 64:
+                time.sleep(self.delay)
+                assert bytes(buf) == data, "传输期间数据被修改"
+            self.writes.append((self.dc.value() if self.dc is not None else None, data))
+        finally:
+            self.active -= 1
+
+    def data(self):
+        """DC 为高电平(数据)的传输"""
+        return [data for dc, data in self.writes if dc == 1]
@@ -0,0 +1,91 @@
+"""
+text() 稳定运行时不申请内存
+
+同一段文字预热后反复绘制，比较绘制 1 个字符和多个字符申请的内存：调用本身(关键字参数、返回的区域)的开销固定，
+读取、缩放、上色和排版都在预分配的缓冲区上完成，不随字符数增加。
+开发板上使用 gc.mem_alloc()(期间关闭垃圾回收)，结果必须完全相同；
+CPython 中使用 tracemalloc 的峰值，framebuf 纯 Python 实现会产生少量临时整数，允许不超过一个点阵的误差。
+
+使用方法:
+    python -m pytest tests
+    mpremote run tests/test_alloc.py  # 开发板上运行，需要先上传 ufont.py、support.py 和字体文件
+"""
+import gc
+
+import support
+import ufont
+from mock_display import MockSSD1306, MockST77XX
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+SHORT = "你"
+LONG = "你好，世界！Hello 123"
+
+
+def allocated(func):
+    """func 执行期间申请的内存(byte)"""
+    for _ in range(3):
+        func()
+    gc.collect()
+    if tracemalloc is None:
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            func()
+            return gc.mem_alloc() - before
+        finally:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        # CPython 迭代字符串时为非 Latin-1 字符新建 str 对象(MicroPython 使用驻留的 qstr)，
+        # 先在追踪期间运行一次，替换排版结果中未被追踪的旧对象
+        func()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def check(font, display, **kwargs):
+    short = allocated(lambda: font.text(display, SHORT, 0, 0, show=False, **kwargs))
+    long = allocated(lambda: font.text(display, LONG, 0, 0, show=False, **kwargs))
+    tolerance = 0 if tracemalloc is None else font.bitmap_size
+    assert long - short <= tolerance, "{} 个字符多申请了 {} byte ({})".format(len(LONG), long - short, kwargs)
+
+
+def test_mono():
+    font = ufont.BMFont(support.FONT)
+    oled = MockSSD1306()
+    check(font, oled)
+    check(font, oled, font_size=24)
+    check(font, oled, reverse=True)
+
+
+def test_rgb565():
+    lcd = MockST77XX(160, 80)
+    for palette_blit in (True, False):
+        font = ufont.BMFont(support.FONT, palette_blit=palette_blit)
+        check(font, lcd)
+        check(font, lcd, font_size=24)
+
+
+def test_bitmap_cache():
+    font = ufont.BMFont(support.FONT, index_cache=32 * 1024, bitmap_cache=2 * 1024)
+    check(font, MockSSD1306())
+    check(font, MockST77XX(160, 80), font_size=24)
+
+
+def test_direct():
+    font = ufont.BMFont(support.FONT)
+    check(font, MockST77XX(160, 80), direct=True)
+
+
+if __name__ == "__main__":
+    for _test in (test_mono, test_rgb565, test_bitmap_cache, test_direct):
+        _test()
+        print(_test.__name__, "ok")
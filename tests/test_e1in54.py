@@ -0,0 +1,93 @@
+"""
+1.54 寸墨水屏驱动测试
+"""
+import asyncio
+
+import support
+import e1in54
+from support import MockSPI
+
+
+def make(spi):
+    epd = e1in54.EPD(spi, cs=1, dc=2, rst=3, busy=4)
+    spi.dc = epd.dc
+    spi.writes.clear()
+    return epd
+
+
+def test_align_window():
+    epd = make(MockSPI())
+    assert epd.align_window(0, 0, 250, 200) == (0, 0, 200, 200)
+    assert epd.align_window(190, 0, 100, 10) == (184, 0, 200, 10)
+    assert epd.align_window(-5, -5, 20, 20) == (0, 0, 16, 15)
+    assert epd.align_window(3, 10, 6, 4) == (0, 10, 16, 14)
+    assert epd.align_window(200, 0, 8, 8) is None
+    assert epd.align_window(300, 0, 8, 8) is None
+
+
+def test_show_region_outside_byte_range():
+    spi = MockSPI()
+    epd = make(spi)
+    epd.fill(1)
+    epd.show_region(190, 0, 100, 10)
+    # 写入两块显存，每块 10 行，每行 2 byte(184 ~ 199)
+    assert spi.data().count(b"\xff\xff") == 20
+
+
+def test_clear_frame_memory():
+    spi = MockSPI()
+    epd = make(spi)
+    epd.clear_frame_memory(0xFF)
+    # 设置窗口和指针的命令 + 每行一次传输，与字节数无关
+    assert len(spi.writes) <= epd.height + 16
+    data = b"".join(data for data in spi.data() if len(data) == epd.width // 8)
+    assert data == b"\xff" * (epd.width // 8 * epd.height)
+
+
+def test_clear_in_place():
+    epd = make(MockSPI())
+    buffer = epd.buffer
+    epd.fill(0)
+    epd.clear()
+    assert epd.buffer is buffer
+    assert bytes(buffer) == b"\xff" * len(buffer)
+    # clear 之后 FrameBuffer 仍然绘制到 self.buffer
+    epd.pixel(0, 0, 0)
+    assert buffer[0] == 0x7F
+
+
+def test_drawing_methods():
+    epd = make(MockSPI())
+    epd.fill(1)
+    epd.line(0, 0, 7, 0, 0)
+    assert epd.buffer[0] == 0x00
+
+
+def test_scheduler_does_not_block():
+    spi = MockSPI()
+    epd = make(spi)
+    scheduler = e1in54.Scheduler(epd, delay_ms=0)
+    scheduler.sleeping = True
+    epd.fill(0)
+    epd.mark_dirty(0, 0, 8, 8)
+
+    # 唤醒(复位)和进入深度睡眠都不能使用阻塞的 sleep_ms
+    def blocking_sleep(ms):
+        raise AssertionError("blocking sleep_ms in Scheduler.flush")
+
+    sleep_ms = e1in54.sleep_ms
+    e1in54.sleep_ms = blocking_sleep
+    try:
+        asyncio.run(scheduler.flush())
+    finally:
+        e1in54.sleep_ms = sleep_ms
+    assert scheduler.sleeping
+    # 唤醒后重写整屏，最后一条命令是进入深度睡眠
+    assert spi.writes[-2:] == [(0, bytes([e1in54.DEEP_SLEEP_MODE])), (1, b"\x01")]
+
+
+if __name__ == "__main__":
+    for _test in (test_align_window, test_show_region_outside_byte_range, test_clear_frame_memory,
+                  test_clear_in_place, test_drawing_methods, test_scheduler_does_not_block):
+        _test()
+        print(_test.__name__, "ok")
@@ -0,0 +1,132 @@
+"""
+ST77XX 驱动测试
+
+双缓冲: 绘制只使用 self.buffer(后缓冲)，前缓冲只由发送方使用；发送期间绘制下一帧不会影响正在发送的数据，
+SPI 不会被两个线程同时使用，每一帧都完整、按顺序发送。
+"""
+import asyncio
+import time
+
+import support
+import st77xx
+from support import MockSPI
+
+WIDTH = 64
+HEIGHT = 32
+FRAME = WIDTH * HEIGHT * 2
+
+
+def make(spi, **kwargs):
+    display = st77xx.ST7789(spi, rst=1, dc=2, cs=3, width=WIDTH, height=HEIGHT, offset=(0, 0, WIDTH, HEIGHT),
+                            rotate=0, **kwargs)
+    spi.dc = display.dc
+    display.wait()
+    spi.writes.clear()
+    return display
+
+
+def frames(spi):
+    return [data for data in spi.data() if len(data) == FRAME]
+
+
+def test_double_buffer_ownership():
+    spi = MockSPI(delay=0.05)
+    display = make(spi, double_buffer=True)
+    assert display.front is not None and display.front is not display.buffer
+
+    display.fill(st77xx.RED)
+    start = time.time()
+    display.swap()
+    # 有后台线程时 swap 不等待发送完成
+    if display.done is not None:
+        assert time.time() - start < spi.delay
+    red = bytes(display.buffer)
+
+    # 发送期间继续在后缓冲上绘制下一帧，MockSPI 会检查正在发送的数据没有变化
+    display.fill(st77xx.BLUE)
+    display.fill_rect(0, 0, 8, 8, st77xx.WHITE)
+    blue = bytes(display.buffer)
+    display.swap()
+
+    # 发送期间刷新区域或直接写屏会先等待后台线程，不会同时使用 SPI
+    display.show_region(0, 0, 8, 8)
+    display.write_window(0, 0, 2, 1, bytearray(4))
+    display.wait()
+
+    assert frames(spi) == [red, blue]
+    assert bytes(display.front) == blue
+
+
+def _ashow_while_drawing(display):
+    # ashow 让出期间另一个协程在后缓冲上绘制下一帧，发送的仍然是调用 ashow 时的内容
+    async def draw():
+        await asyncio.sleep_ms(0)
+        display.fill(st77xx.BLUE)
+
+    async def main():
+        display.fill(st77xx.RED)
+        red = bytes(display.buffer)
+        task = asyncio.create_task(draw())
+        await display.ashow(rows=4)
+        await task
+        return red
+
+    return asyncio.run(main())
+
+
+def test_double_buffer_ashow():
+    spi = MockSPI(delay=0.05)
+    display = make(spi, double_buffer=True)
+    red = _ashow_while_drawing(display)
+    # 由后台线程发送前缓冲，ashow 返回时已经发送完成
+    assert frames(spi) == [red]
+    assert bytes(display.front) == red
+    assert bytes(display.buffer) != red
+
+
+def test_double_buffer_ashow_without_thread():
+    _thread = st77xx._thread
+    st77xx._thread = None
+    try:
+        spi = MockSPI()
+        display = make(spi, double_buffer=True)
+        red = _ashow_while_drawing(display)
+        # 分多次发送，拼起来是完整的一帧
+        chunks = [data for data in spi.data() if len(data) == WIDTH * 2 * 4]
+        assert len(chunks) == HEIGHT // 4
+        assert b"".join(chunks) == red
+    finally:
+        st77xx._thread = _thread
+
+
+def test_double_buffer_without_thread():
+    _thread = st77xx._thread
+    st77xx._thread = None
+    try:
+        spi = MockSPI()
+        display = make(spi, double_buffer=True)
+        assert display.done is None
+        display.fill(st77xx.GREEN)
+        display.show()
+        assert frames(spi) == [bytes(display.buffer)]
+    finally:
+        st77xx._thread = _thread
+
+
+def test_bufferless():
+    spi = MockSPI()
+    display = make(spi, buffered=False)
+    assert display.buffer is None
+    display.fill_rect(4, 2, 3, 5, st77xx.RED)
+    red = st77xx.RED.to_bytes(2, "little")
+    assert spi.data()[-5:] == [red * 3] * 5
+    # 其他 FrameBuffer 方法仍然可以调用(只作用于一行的缓冲区，不会显示)
+    display.line(0, 0, 10, 10, st77xx.WHITE)
+    display.circle((10, 10), 5)
+
+
+if __name__ == "__main__":
+    for _test in (test_double_buffer_ownership, test_double_buffer_ashow, test_double_buffer_ashow_without_thread,
+                  test_double_buffer_without_thread, test_bufferless):
+        _test()
+        print(_test.__name__, "ok")
@@ -0,0 +1,236 @@
+"""
+.bmf 字体文件读写(电脑端使用)
+
+文件头 16 byte，按照顺序依次是
+    文件标识 "BM" 2 byte
+    版本号 1 byte
+    映射方式 1 byte
+    位图开始字节 3 byte
+    字号 1 byte
+    单字点阵字节大小 1 byte
+    v3: 保留 2 byte
+    v4: 页数 2 byte
+    压缩方式 1 byte: 0 不压缩，1 行字典压缩
+    字符数 3 byte: 仅压缩时使用
+    保留 1 byte
+
+v3 索引: 0x10 开始，按编码升序排列的 uint16(大端)编码表，查找时需要二分查找
+v4 索引: 0x10 开始
+    页目录 256 * uint16: 编码高字节 -> 页号，0xFFFF 表示该页没有字符
+    页 页数 * 256 * uint16: 编码低字节 -> 点阵序号，0xFFFF 表示缺字
+    查找一个字符最多读取两次(页目录通常常驻内存，只需读取一次)
+两个版本的位图均位于位图开始字节之后，按编码升序排列
+
+行字典压缩: 位图开始字节之后依次是
+    每行字节数 1 byte
+    字典行数 1 byte(最多 255 行)
+    每块字符数 1 byte
+    字典 字典行数 * 每行字节数
+    块表 每块字符数个点阵为一块，每块依次为
+        块内第一个点阵的偏移 3 byte(大端，相对于压缩数据开始位置)
+        块内每个点阵的行标记 (行数 + 7) // 8 byte，每行 1 bit(高位在前): 1 表示该行为 1 byte 字典行号，0 表示原始行数据
+        最后一块不足时用 0 补齐
+    压缩数据 按序号依次存放，点阵的长度由行标记决定，块内其他点阵的位置由块偏移加上之前各点阵的长度得到
+    16 像素的 unifont 位图约缩小到 80%
+"""
+import collections
+import struct
+
+PAGE_EMPTY = 0xFFFF
+COMPRESS_NONE = 0
+COMPRESS_ROW_DICT = 1
+DICT_ROWS = 255
+BLOCK_GLYPHS = 16
+
+
+class BMF:
+    def __init__(self, font_size, bitmap_size, map_mode=0, codes=None, bitmaps=None):
+        """
+        Args:
+            font_size: 字号
+            bitmap_size: 单字点阵字节大小
+            map_mode: 映射方式
+            codes: 按升序排列的字符编码
+            bitmaps: 与 codes 一一对应的点阵
+        """
+        self.font_size = font_size
+        self.bitmap_size = bitmap_size
+        self.map_mode = map_mode
+        self.codes = list(codes or [])
+        self.bitmaps = list(bitmaps or [])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def subset(self, chars):
+        """只保留 chars 中出现的字符"""
+        wanted = set(ord(c) for c in chars)
+        pairs = [(c, b) for c, b in zip(self.codes, self.bitmaps) if c in wanted]
+        return BMF(self.font_size, self.bitmap_size, self.map_mode, [c for c, _ in pairs], [b for _, b in pairs])
+
+
+def _header(version, map_mode, start_bitmap, font_size, bitmap_size, pages=0, compress=COMPRESS_NONE, count=0):
+    return (b"BM" + bytes([version, map_mode]) + start_bitmap.to_bytes(3, "big") +
+            bytes([font_size, bitmap_size]) + pages.to_bytes(2, "big") + bytes([compress]) +
+            count.to_bytes(3, "big")).ljust(16, b"\x00")
+
+
+def row_size(font):
+    """压缩时每行的字节数，点阵不是按行对齐时整体按字节处理"""
+    if font.bitmap_size % font.font_size == 0:
+        return font.bitmap_size // font.font_size
+    return 1
+
+
+def compress(font, block=BLOCK_GLYPHS):
+    """
+    行字典压缩
+    Args:
+        block: 每块字符数
+    Returns:
+        位图区域的数据(包含字典和块表)
+    """
+    size = row_size(font)
+    rows = font.bitmap_size // size
+    mask_size = (rows + 7) >> 3
+    counter = collections.Counter()
+    for bitmap in font.bitmaps:
+        for i in range(0, len(bitmap), size):
+            counter[bytes(bitmap[i:i + size])] += 1
+    # 出现一次的行放入字典没有收益
+    dictionary = [row for row, count in counter.most_common(DICT_ROWS) if count > 1]
+    codes = {row: i for i, row in enumerate(dictionary)}
+
+    table = bytearray()
+    data = bytearray()
+    for start in range(0, len(font.bitmaps), block):
+        table += len(data).to_bytes(3, "big")
+        chunk = font.bitmaps[start:start + block]
+        for bitmap in chunk:
+            mask = 0
+            for r in range(rows):
+                row = bytes(bitmap[r * size:(r + 1) * size])
+                if row in codes:
+                    mask |= 1 << (mask_size * 8 - 1 - r)
+                    data.append(codes[row])
+                else:
+                    data += row
+            table += mask.to_bytes(mask_size, "big")
+        table += bytes((block - len(chunk)) * mask_size)
+    if len(data) > 0xFFFFFF:
+        raise ValueError("压缩数据过大")
+    return bytes([size, len(dictionary), block]) + b"".join(dictionary) + bytes(table) + bytes(data)
+
+
+def decompress(data, count, bitmap_size):
+    """解压行字典压缩的位图区域，返回点阵列表"""
+    size, entries, block = data[0], data[1], data[2]
+    rows = bitmap_size // size
+    mask_size = (rows + 7) >> 3
+    dictionary = data[3:3 + entries * size]
+    table = 3 + entries * size
+    record = 3 + block * mask_size
+    start = table + (count + block - 1) // block * record
+    bitmaps = []
+    for i in range(count):
+        if i % block == 0:
+            begin = start + int.from_bytes(data[table:table + 3], "big")
+            masks = table + 3
+            table += record
+        mask = int.from_bytes(data[masks:masks + mask_size], "big")
+        masks += mask_size
+        bitmap = bytearray()
+        for r in range(rows):
+            if mask >> (mask_size * 8 - 1 - r) & 1:
+                bitmap += dictionary[data[begin] * size:(data[begin] + 1) * size]
+                begin += 1
+            else:
+                bitmap += data[begin:begin + size]
+                begin += size
+        bitmaps.append(bytes(bitmap))
+    return bitmaps
+
+
+def load(path):
+    """读取 v3/v4 字体文件"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[0:2] != b"BM":
+        raise TypeError("字体文件格式不正确: " + path)
+    version = data[2]
+    map_mode = data[3]
+    start_bitmap = int.from_bytes(data[4:7], "big")
+    font_size = data[7]
+    bitmap_size = data[8]
+
+    if version == 3:
+        count = (start_bitmap - 0x10) // 2
+        codes = list(struct.unpack(">%dH" % count, data[0x10:start_bitmap]))
+    elif version == 4:
+        pages = int.from_bytes(data[9:11], "big")
+        directory = struct.unpack(">256H", data[0x10:0x210])
+        table = struct.unpack(">%dH" % (pages * 256), data[0x210:0x210 + pages * 512])
+        slots = []
+        for high, page in enumerate(directory):
+            if page == PAGE_EMPTY:
+                continue
+            for low in range(256):
+                index = table[page * 256 + low]
+                if index != PAGE_EMPTY:
+                    slots.append((index, (high << 8) | low))
+        codes = [code for _, code in sorted(slots)]
+    else:
+        raise TypeError("字体文件版本不正确: " + str(version))
+
+    if data[11] == COMPRESS_ROW_DICT:
+        bitmaps = decompress(data[start_bitmap:], len(codes), bitmap_size)
+    elif data[11] == COMPRESS_NONE:
+        bitmaps = [data[start_bitmap + i * bitmap_size:start_bitmap + (i + 1) * bitmap_size]
+                   for i in range(len(codes))]
+    else:
+        raise TypeError("不支持的压缩方式: " + str(data[11]))
+    return BMF(font_size, bitmap_size, map_mode, codes, bitmaps)
+
+
+def _bitmap_section(font, compressed):
+    return compress(font) if compressed else b"".join(font.bitmaps)
+
+
+def dump_v3(font, compressed=False):
+    """生成 v3 字体文件数据"""
+    index = struct.pack(">%dH" % len(font.codes), *font.codes)
+    start_bitmap = 0x10 + len(index)
+    return (_header(3, font.map_mode, start_bitmap, font.font_size, font.bitmap_size,
+                    compress=COMPRESS_ROW_DICT if compressed else COMPRESS_NONE,
+                    count=len(font) if compressed else 0) +
+            index + _bitmap_section(font, compressed))
+
+
+def dump_v4(font, compressed=False):
+    """生成 v4 字体文件数据"""
+    if len(font.codes) >= PAGE_EMPTY:
+        raise ValueError("v4 最多支持 65534 个字符")
+    if font.codes and font.codes[-1] > 0xFFFF:
+        raise ValueError("v4 只支持 0xFFFF 以内的字符")
+    directory = [PAGE_EMPTY] * 256
+    pages = []
+    for index, code in enumerate(font.codes):
+        high = code >> 8
+        if directory[high] == PAGE_EMPTY:
+            directory[high] = len(pages)
+            pages.append([PAGE_EMPTY] * 256)
+        pages[directory[high]][code & 0xFF] = index
+    table = struct.pack(">256H", *directory) + b"".join(struct.pack(">256H", *page) for page in pages)
+    start_bitmap = 0x10 + len(table)
+    return (_header(4, font.map_mode, start_bitmap, font.font_size, font.bitmap_size, pages=len(pages),
+                    compress=COMPRESS_ROW_DICT if compressed else COMPRESS_NONE,
+                    count=len(font) if compressed else 0) +
+            table + _bitmap_section(font, compressed))
+
+
+def save(font, path, version=3, compressed=False):
+    """保存字体文件"""
+    data = {3: dump_v3, 4: dump_v4}[version](font, compressed)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
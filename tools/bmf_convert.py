@@ -0,0 +1,33 @@
+"""
+.bmf 字体文件版本转换(电脑端使用)
+
+使用方法:
+    python tools/bmf_convert.py unifont-14-12917-16.v3.bmf unifont-14-12917-16.v4.bmf
+    python tools/bmf_convert.py unifont-14-12917-16.v4.bmf unifont-14-12917-16.v3.bmf --version 3
+    python tools/bmf_convert.py unifont-14-12917-16.v3.bmf unifont-14-12917-16-rd.v4.bmf --compress
+"""
+import argparse
+import os
+
+import bmf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=".bmf 字体文件版本转换")
+    parser.add_argument("source", help="原字体文件(v3/v4)")
+    parser.add_argument("target", help="输出字体文件")
+    parser.add_argument("--version", type=int, choices=(3, 4), default=4, help="输出版本，默认为 4")
+    parser.add_argument("--compress", action="store_true", help="使用行字典压缩位图")
+    args = parser.parse_args()
+
+    font = bmf.load(args.source)
+    size = bmf.save(font, args.target, args.version, args.compress)
+    print("{} 个字符，{} -> {} byte".format(len(font), os.path.getsize(args.source), size))
+    if args.compress:
+        raw = len(font) * font.bitmap_size
+        packed = len(bmf.compress(font))
+        print("位图 {} -> {} byte ({:.1%})".format(raw, packed, packed / raw))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+从应用程序用到的文字生成精简的 .bmf 字体文件(电脑端使用)
+
+只保留源码或文字清单中出现的字符，生成的文件可以直接被 ufont 读取。
+字符越少，文件越小，二分查找的次数也越少。
+
+使用方法:
+    python tools/bmf_subset.py unifont-14-12917-16.v3.bmf app.v3.bmf main.py ui/*.py
+    python tools/bmf_subset.py unifont-14-12917-16.v3.bmf app.v3.bmf strings.txt --ascii --chars "℃°"
+    python tools/bmf_subset.py unifont-14-12917-16.v3.bmf app.v4.bmf main.py --version 4
+
+.py 文件只收集字符串常量(不含注释和标识符)，其他文件收集全部字符。
+"""
+import argparse
+import ast
+import os
+
+import bmf
+
+# 可见 ASCII 字符
+ASCII = "".join(chr(c) for c in range(0x20, 0x7F))
+
+
+def python_strings(source):
+    """收集 Python 源码中的字符串常量"""
+    chars = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            chars.update(node.value)
+    return chars
+
+
+def collect(paths):
+    """收集文件中出现的字符"""
+    chars = set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        if path.endswith(".py"):
+            try:
+                chars.update(python_strings(source))
+                continue
+            except SyntaxError:
+                print("{} 无法解析，按普通文本处理".format(path))
+        chars.update(source)
+    return chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成只包含所需字符的 .bmf 字体文件")
+    parser.add_argument("source", help="原字体文件(v3/v4)")
+    parser.add_argument("target", help="输出字体文件")
+    parser.add_argument("files", nargs="*", help="源码或文字清单，.py 文件只收集字符串常量")
+    parser.add_argument("--chars", default="", help="额外需要的字符")
+    parser.add_argument("--ascii", action="store_true", help="包含全部可见 ASCII 字符")
+    parser.add_argument("--version", type=int, choices=(3, 4), default=3, help="输出版本，默认为 3")
+    parser.add_argument("--compress", action="store_true", help="使用行字典压缩位图")
+    args = parser.parse_args()
+
+    chars = collect(args.files)
+    chars.update(args.chars)
+    if args.ascii:
+        chars.update(ASCII)
+    # 换行、制表符等控制字符由 ufont 排版处理，不需要点阵
+    chars = set(c for c in chars if ord(c) >= 0x20)
+
+    font = bmf.load(args.source)
+    subset = font.subset(chars)
+    missing = sorted(chars - set(chr(code) for code in subset.codes))
+    size = bmf.save(subset, args.target, args.version, args.compress)
+    source_size = os.path.getsize(args.source)
+
+    print("字符 {} -> {}".format(len(font), len(subset)))
+    print("文件 {} -> {} byte，节省 {} byte ({:.1%})".format(
+        source_size, size, source_size - size, 1 - size / source_size))
+    if missing:
+        print("字体中缺少 {} 个字符: {}".format(len(missing), "".join(missing)))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,39 +8,294 @@ __version__ = 3
 
 import time
 import struct
+from array import array
 
 import framebuf
 
+# viper 加速实现(可选)
+#   固件不支持 viper 或没有上传 ufont_viper.py 时使用纯 Python 实现
+try:
+    import ufont_viper
+except (ImportError, SyntaxError):
+    ufont_viper = None
+
+# 异步绘制(atext)，固件没有 asyncio 时不可用
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None
+
+# 每个字节中 1 的个数，用于根据行标记计算压缩点阵的长度
+_BITS = bytes(bin(_i).count("1") for _i in range(256))
+
+# 性能统计
+#   需要在导入前修改，装饰器在定义类时根据 PROFILE 决定是否包装函数，关闭时没有任何额外开销
+#   开启后通过 BMFont.stats() 获取统计数据，同时开启 DEBUG 则每次调用都会打印耗时
+PROFILE = False
 DEBUG = False
 
+# 函数名 -> [调用次数, 总耗时(us), 最短耗时(us), 最长耗时(us), 申请内存(byte)]
+PROFILE_STATS = {}
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    # CPython
+    def _ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def _ticks_diff(a, b):
+        return a - b
+
+try:
+    from gc import mem_alloc as _mem_alloc
+except ImportError:
+    def _mem_alloc():
+        return 0
+
+
+def profile(func):
+    """统计函数调用次数、耗时和申请的内存"""
+    if not PROFILE:
+        return func
 
-def timeit(func, *args, **kwargs):
-    """测试函数运行时间"""
     # 当交叉编译后无法获取函数名
     try:
         _name = func.__name__
     except AttributeError:
         _name = "Unknown"
+    _stat = PROFILE_STATS.setdefault(_name, [0, 0, 0, 0, 0])
 
     def get_running_time(*args, **kwargs):
+        _alloc = _mem_alloc()
+        t = _ticks_us()
+        result = func(*args, **kwargs)
+        delta = _ticks_diff(_ticks_us(), t)
+        # 期间发生垃圾回收时差值可能为负
+        _alloc = _mem_alloc() - _alloc
+        _stat[0] += 1
+        _stat[1] += delta
+        _stat[2] = delta if _stat[0] == 1 or delta < _stat[2] else _stat[2]
+        _stat[3] = delta if delta > _stat[3] else _stat[3]
+        _stat[4] += _alloc if _alloc > 0 else 0
         if DEBUG:
-            t = time.ticks_us()
-            result = func(*args, **kwargs)
-            delta = time.ticks_diff(time.ticks_us(), t)
             print('Function {} Time = {:6.3f}ms'.format(_name, delta / 1000))
-            return result
-        else:
-            return func(*args, **kwargs)
+        return result
 
     return get_running_time
 
 
+class GlyphCache:
+    """
+    字符点阵 LRU 缓存
+        所有点阵保存在一块预分配的 bytearray 中，按槽位存放，避免频繁申请内存导致堆碎片
+        槽位之间用双向链表维护使用顺序，表头为最近使用，表尾为最久未使用
+    """
+
+    def __init__(self, size: int, bitmap_size: int):
+        """
+        Args:
+            size: 缓存大小(byte)
+            bitmap_size: 单字点阵字节大小
+        """
+        self.bitmap_size = bitmap_size
+        self.capacity = size // bitmap_size
+        self.arena = bytearray(self.capacity * bitmap_size)
+        # 预先切好每个槽位的 memoryview，命中时不再产生新对象
+        _arena = memoryview(self.arena)
+        self._views = [_arena[_slot * bitmap_size:(_slot + 1) * bitmap_size] for _slot in range(self.capacity)]
+        # 字符编码 -> 槽位
+        self._slots = {}
+        # 槽位 -> 字符编码
+        self._codes = array("i", [-1] * self.capacity)
+        self._prev = array("h", [-1] * self.capacity)
+        self._next = array("h", [-1] * self.capacity)
+        self._head = -1
+        self._tail = -1
+        self._used = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _unlink(self, slot: int):
+        _prev = self._prev[slot]
+        _next = self._next[slot]
+        if _prev == -1:
+            self._head = _next
+        else:
+            self._next[_prev] = _next
+        if _next == -1:
+            self._tail = _prev
+        else:
+            self._prev[_next] = _prev
+
+    def _push(self, slot: int):
+        self._prev[slot] = -1
+        self._next[slot] = self._head
+        if self._head != -1:
+            self._prev[self._head] = slot
+        self._head = slot
+        if self._tail == -1:
+            self._tail = slot
+
+    def get(self, code: int):
+        """
+        查找缓存
+        Args:
+            code: 字符编码
+
+        Returns:
+            命中返回点阵(memoryview)，否则返回 None
+        """
+        slot = self._slots.get(code, -1)
+        if slot == -1:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if slot != self._head:
+            self._unlink(slot)
+            self._push(slot)
+        return self._views[slot]
+
+    def put(self, code: int):
+        """
+        为字符分配槽位，缓存已满时淘汰最久未使用的点阵
+        Args:
+            code: 字符编码
+
+        Returns:
+            槽位(memoryview)，由调用者写入点阵数据
+        """
+        if self._used < self.capacity:
+            slot = self._used
+            self._used += 1
+        else:
+            slot = self._tail
+            self._unlink(slot)
+            del self._slots[self._codes[slot]]
+            self.evictions += 1
+        self._codes[slot] = code
+        self._slots[code] = slot
+        self._push(slot)
+        return self._views[slot]
+
+    def __contains__(self, code: int) -> bool:
+        return code in self._slots
+
+    def info(self) -> dict:
+        """缓存统计"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "used": self._used, "capacity": self.capacity, "size": len(self.arena)}
+
+
+class FrameCache:
+    """
+    渲染结果缓存
+        缓存已经渲染好的 FrameBuffer，按占用字节数限制总大小，超出时淘汰最久未使用的条目
+    """
+
+    def __init__(self, size: int):
+        """
+        Args:
+            size: 缓存大小(byte)
+        """
+        self.size = size
+        self.used = 0
+        # key -> [FrameBuffer, 占用字节, 最近使用时刻]
+        self._items = {}
+        self._tick = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._tick += 1
+        item[2] = self._tick
+        return item[0]
+
+    def put(self, key, frame, nbytes: int):
+        """
+        Args:
+            key: 缓存键
+            frame: FrameBuffer
+            nbytes: FrameBuffer 占用的字节数
+        """
+        if nbytes > self.size:
+            return
+        # 淘汰最久未使用的条目直到放得下，只有未命中时才会进行，线性查找即可
+        while self.used + nbytes > self.size:
+            _oldest = None
+            _tick = self._tick + 1
+            for _key, _item in self._items.items():
+                if _item[2] < _tick:
+                    _oldest = _key
+                    _tick = _item[2]
+            self.used -= self._items.pop(_oldest)[1]
+            self.evictions += 1
+        self._tick += 1
+        self._items[key] = [frame, nbytes, self._tick]
+        self.used += nbytes
+
+    def info(self) -> dict:
+        """缓存统计"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "used": self.used, "size": self.size}
+
+
+class BlockFile:
+    """
+    块设备的只读文件接口
+        让 BMFont 直接从 esp32.Partition 等块设备读取字体，不经过文件系统；
+        需要块设备支持扩展接口 `readblocks(块号, 缓冲区, 块内偏移)`
+    """
+
+    def __init__(self, device, block_size: int = None):
+        """
+        Args:
+            device: 块设备，例如 `esp32.Partition.find(label="font")[0]`
+            block_size: 块大小，默认通过 `ioctl(5, 0)` 获取
+        """
+        self.device = device
+        self.block_size = block_size or device.ioctl(5, 0)
+        self.offset = 0
+
+    def seek(self, offset: int, whence: int = 0):
+        self.offset = offset
+
+    def readinto(self, buffer) -> int:
+        self.device.readblocks(self.offset // self.block_size, buffer, self.offset % self.block_size)
+        self.offset += len(buffer)
+        return len(buffer)
+
+    def close(self):
+        pass
+
+
 class BMFont:
-    @timeit
+    # 缺字时显示的点阵
+    TOFU = b'\xff\xff\xff\xff\xff\xff\xff\xff\xf0\x0f\xcf\xf3\xcf\xf3\xff\xf3\xff\xcf\xff?\xff?\xff\xff\xff' \
+           b'?\xff?\xff\xff\xff\xff'
+
+    # 直接写屏时合并同一行字符的缓冲区大小上限(byte)，每种字号一块，宽度不超过屏幕，至少能放下一个字符
+    DIRECT_RUN_BYTES = 4 * 1024
+
+    @profile
     def text(self, display, string: str, x: int, y: int,
              color: int = 0xFFFF, bg_color: int = 0, font_size: int = None,
              half_char: bool = True, auto_wrap: bool = False, show: bool = True, clear: bool = False,
-             alpha_color: bool = 0, reverse: bool = False, color_type: int = -1, line_spacing: int = 0, **kwargs):
+             alpha_color: bool = 0, reverse: bool = False, color_type: int = -1, line_spacing: int = 0,
+             partial_show: bool = False, glyphs: list = None, direct: bool = False, **kwargs):
         """
         Args:
             display: 显示对象
@@ -58,22 +313,34 @@ class BMFont:
             reverse: 逆置(MONO)
             color_type: 色彩模式 0:MONO 1:RGB565
             line_spacing: 行间距
+            partial_show: 只刷新绘制过的区域(需要显示驱动支持 `show_dirty`)
+            glyphs: 预先计算好的排版(`layout` 的返回值)，指定时不再重新排版，x/y/half_char/auto_wrap/line_spacing 不再生效
+            direct: 直接写屏(需要驱动支持 `write_window`)，字符渲染为 RGB565 后直接发送到屏幕，不经过也不修改帧缓冲，
+                同一行连续的字符合并为一次窗口写入；没有帧缓冲的驱动(例如 ST77XX(buffered=False))总是直接写屏
             **kwargs:
 
         Returns:
+            本次绘制的区域 (x, y, w, h)，没有绘制任何字符时为 None
         MoreInfo: https://github.com/AntonVanke/MicroPython-uFont/blob/master/README.md
         """
         # 如果没有指定字号则使用默认字号
         font_size = font_size or self.font_size
-        # 记录初始的 x 位置
-        initial_x = x
+
+        # 直接写屏
+        #   字符渲染为 RGB565 后通过 write_window 发送，字符背景会覆盖屏幕原有内容，alpha_color 不再生效
+        direct = direct or display.buffer is None
+        if direct:
+            color_type = 1
 
         # 设置颜色类型
         if color_type == -1 and (display.width * display.height) > len(display.buffer):
             color_type = 0
         elif color_type == -1 or color_type == 1:
-            palette = [[bg_color & 0xFF, (bg_color & 0xFF00) >> 8], [color & 0xFF, (color & 0xFF00) >> 8]]
             color_type = 1
+            # 调色板: 点阵保持 MONO_HLSB，由 blit 完成 0/1 -> 背景色/字体颜色 的转换
+            if self.palette_blit:
+                self.palette.pixel(0, 0, bg_color)
+                self.palette.pixel(1, 0, color)
 
         # 处理黑白屏幕的背景反转问题
         if color_type == 0 and color == 0 != bg_color or color_type == 0 and reverse:
@@ -88,60 +355,278 @@ class BMFont:
         except AttributeError:
             print("请自行调用 display.fill() 清屏")
 
-        for char in range(len(string)):
-            if auto_wrap and ((x + font_size // 2 > display.width and ord(string[char]) < 128 and half_char) or
-                              (x + font_size > display.width and (not half_char or ord(string[char]) > 128))):
+        # 是否使用彩色渲染缓存
+        use_frame_cache = color_type == 1 and not self.palette_blit and self.frame_cache is not None
+        # 启用点阵缓存时，多个字符批量读取点阵并写入缓存，减少文件的 seek/read 次数
+        #   批量读取需要临时的字典和缓冲区，没有点阵缓存时逐个 readinto 到 self.glyph，不申请内存；
+        #   点阵已全部缓存时直接使用缓存，彩色渲染缓存生效时大部分字符无需读取点阵，逐个读取即可
+        if len(string) > 1 and self.bitmap_cache is not None and not use_frame_cache and self.data is None \
+                and not self._all_cached(string):
+            bitmaps = self.get_bitmaps(string)
+        else:
+            bitmaps = None
+
+        # 常驻的渲染结果
+        #   彩色屏幕不使用调色板时按 (字符, 字号, 颜色, 背景色) 查找 RGB565，否则按 (字符, 字号) 查找单色点阵；
+        #   反色会修改缓冲区，不使用常驻的单色点阵
+        pinned_color = color_type == 1 and not self.palette_blit
+        use_pinned = bool(self.pinned_frames) and (pinned_color or not reverse)
+
+        # 直接写屏时同一行连续的字符先合成到 run_frame，换行、不连续或超过宽度时再一次写入屏幕
+        #   run_end 为 0 表示没有待写入的字符
+        if direct:
+            run_buffer, run_frame, run_limit = self._run_tile(font_size, display.width)
+            run_x = run_y = run_end = 0
+
+        # 绘制区域
+        min_x = min_y = 0x7FFF
+        max_x = max_y = -1
+
+        # 排版，结果写入复用的 self.glyph_list
+        if glyphs is None:
+            glyphs = self.layout(string, x, y, font_size, half_char, auto_wrap, display.width, line_spacing,
+                                 self.glyph_list)
+
+        for _i in range(0, len(glyphs), 3):
+            word = glyphs[_i]
+            x = glyphs[_i + 1]
+            y = glyphs[_i + 2]
+
+            # 超过范围的字符不会显示*
+            if x > display.width or y > display.height or x + font_size <= 0 or y + font_size <= 0:
+                continue
+
+            frame = None
+            if use_pinned:
+                frame = self.pinned_frames.get((word, font_size, color, bg_color) if pinned_color else (word, font_size))
+
+            if frame is not None:
+                pass
+            elif use_frame_cache:
+                # 使用已经渲染好的缓存，未命中时渲染到新的缓冲区并加入缓存
+                _key = (word, font_size, color, bg_color)
+                frame = self.frame_cache.get(_key)
+                if frame is None:
+                    bitmap = self._load_bitmap(word)
+                    if font_size == self.font_size:
+                        _buffer = self._flatten_byte_data(bitmap, bg_color, color)
+                    else:
+                        _buffer = self._RGB565_font_size(bitmap, font_size, self.font_size, bg_color, color)
+                    frame = framebuf.FrameBuffer(_buffer, font_size, font_size, framebuf.RGB565)
+                    self.frame_cache.put(_key, frame, len(_buffer))
+            else:
+                # 获取字体的点阵数据
+                bitmap = bitmaps[word] if bitmaps is not None else self._load_bitmap(word)
+
+                # 分四种情况逐个优化，全部渲染到预先分配的缓冲区，不产生新的对象
+                #   1. 黑白屏幕(或调色板)/无放缩
+                #   2. 黑白屏幕(或调色板)/放缩
+                #   3. 彩色屏幕/无放缩
+                #   4. 彩色屏幕/放缩
+                if color_type == 0 or self.palette_blit:
+                    if font_size == self.font_size:
+                        if bitmap is not self.glyph:
+                            self.glyph[:] = bitmap
+                        _buffer, frame = self.glyph, self.glyph_frame
+                    else:
+                        _buffer, frame = self._scratch(font_size, False)
+                        self._HLSB_font_size(bitmap, font_size, self.font_size, _buffer)
+                    if reverse:
+                        self._reverse_byte_data(_buffer)
+                elif font_size == self.font_size:
+                    _buffer, frame = self._scratch(font_size, True)
+                    self._flatten_byte_data(bitmap, bg_color, color, _buffer)
+                else:
+                    _buffer, frame = self._scratch(font_size, True)
+                    self._RGB565_font_size(bitmap, font_size, self.font_size, bg_color, color, _buffer)
+
+            if direct:
+                if run_end and (y != run_y or x < run_x or x > run_end or x + font_size - run_x > run_limit):
+                    display.write_window(run_x, run_y, run_end - run_x, font_size, run_buffer, run_limit)
+                    run_end = 0
+                if not run_end:
+                    run_x = x
+                    run_y = y
+                if self.palette_blit:
+                    run_frame.blit(frame, x - run_x, 0, -1, self.palette)
+                else:
+                    run_frame.blit(frame, x - run_x, 0)
+                run_end = x + font_size if x + font_size > run_end else run_end
+            elif color_type == 1 and self.palette_blit:
+                display.blit(frame, x, y, alpha_color, self.palette)
+            else:
+                display.blit(frame, x, y, alpha_color)
+
+            # 记录绘制区域
+            min_x = x if x < min_x else min_x
+            min_y = y if y < min_y else min_y
+            max_x = x + font_size if x + font_size > max_x else max_x
+            max_y = y + font_size if y + font_size > max_y else max_y
+
+        if direct and run_end:
+            display.write_window(run_x, run_y, run_end - run_x, font_size, run_buffer, run_limit)
+
+        # 绘制区域限制在屏幕范围内
+        min_x = min_x if min_x > 0 else 0
+        min_y = min_y if min_y > 0 else 0
+        max_x = max_x if max_x < display.width else display.width
+        max_y = max_y if max_y < display.height else display.height
+        region = (min_x, min_y, max_x - min_x, max_y - min_y) if max_x > min_x and max_y > min_y else None
+
+        # 直接写屏的内容已经在屏幕上，帧缓冲中没有这些内容，不能再标记或刷新
+        if direct:
+            return region
+
+        # 标记脏区域，由驱动决定刷新范围
+        if region is not None and hasattr(display, "mark_dirty"):
+            display.mark_dirty(*region)
+
+        if show:
+            if partial_show and not clear and hasattr(display, "show_dirty"):
+                display.show_dirty()
+            else:
+                display.show()
+        return region
+
+    async def atext(self, display, string: str, x: int, y: int,
+                    color: int = 0xFFFF, bg_color: int = 0, font_size: int = None,
+                    half_char: bool = True, auto_wrap: bool = False, show: bool = True, clear: bool = False,
+                    alpha_color: bool = 0, reverse: bool = False, color_type: int = -1, line_spacing: int = 0,
+                    partial_show: bool = False, glyphs: list = None, direct: bool = False, batch: int = 8,
+                    **kwargs):
+        """
+        异步绘制
+            参数和返回值同 text；每绘制 batch 个字符让出一次，显示驱动提供 ashow/ashow_dirty 时异步刷新，
+            绘制和刷新期间其他协程(传感器、网络)可以继续运行
+
+        Args:
+            batch: 每批绘制的字符数
+        """
+        font_size = font_size or self.font_size
+        if glyphs is None:
+            glyphs = self.layout(string, x, y, font_size, half_char, auto_wrap, display.width, line_spacing)
+        if clear:
+            try:
+                display.clear()
+            except AttributeError:
+                print("请自行调用 display.fill() 清屏")
+
+        region = None
+        for _i in range(0, len(glyphs), batch * 3):
+            _glyphs = glyphs[_i:_i + batch * 3]
+            _region = self.text(display, "".join(_glyphs[::3]), x, y, color, bg_color, font_size, half_char,
+                                auto_wrap, False, False, alpha_color, reverse, color_type, line_spacing,
+                                glyphs=_glyphs, direct=direct)
+            if _region is not None:
+                if region is None:
+                    region = _region
+                else:
+                    _x = min(region[0], _region[0])
+                    _y = min(region[1], _region[1])
+                    region = (_x, _y, max(region[0] + region[2], _region[0] + _region[2]) - _x,
+                              max(region[1] + region[3], _region[1] + _region[3]) - _y)
+            await asyncio.sleep(0)
+
+        if show and not (direct or display.buffer is None):
+            if partial_show and not clear and hasattr(display, "show_dirty"):
+                if hasattr(display, "ashow_dirty"):
+                    await display.ashow_dirty()
+                else:
+                    display.show_dirty()
+            elif hasattr(display, "ashow"):
+                await display.ashow()
+            else:
+                display.show()
+        return region
+
+    @profile
+    def layout(self, string: str, x: int = 0, y: int = 0, font_size: int = None, half_char: bool = True,
+               auto_wrap: bool = False, width: int = None, line_spacing: int = 0, out: list = None) -> list:
+        """
+        排版
+            计算每个字符的位置，不读取点阵；结果可以直接传给 `text(glyphs=...)`，不变的字符串可以缓存排版结果
+        Args:
+            string: 文字
+            x: 字符串左上角 x 轴
+            y: 字符串左上角 y 轴
+            font_size: 字号大小
+            half_char: 半宽显示 ASCII 字符
+            auto_wrap: 自动换行
+            width: 自动换行的宽度，一般为屏幕宽度；为 None 时不换行
+            line_spacing: 行间距
+            out: 写入结果的列表，指定时覆盖原有内容并返回该列表，长度不超过之前的结果时不申请内存
+
+        Returns:
+            [字符, x, y, 字符, x, y, ...] 只包含需要绘制的字符，为减少对象数量使用扁平列表
+        """
+        font_size = font_size or self.font_size
+        auto_wrap = auto_wrap and width is not None
+        # 记录初始的 x 位置
+        initial_x = x
+        glyphs = [] if out is None else out
+        _n = 0
+        for word in string:
+            if auto_wrap and ((x + font_size // 2 > width and ord(word) < 128 and half_char) or
+                              (x + font_size > width and (not half_char or ord(word) > 128))):
                 y += font_size + line_spacing
                 x = initial_x
 
             # 对控制字符的处理
-            if string[char] == '\n':
+            if word == '\n':
                 y += font_size + line_spacing
                 x = initial_x
                 continue
-            elif string[char] == '\t':
+            elif word == '\t':
                 x = ((x // font_size) + 1) * font_size + initial_x % font_size
                 continue
-            elif ord(string[char]) < 16:
+            elif ord(word) < 16:
                 continue
 
-            # 超过范围的字符不会显示*
-            if x > display.width or y > display.height:
-                continue
+            if _n < len(glyphs):
+                glyphs[_n] = word
+                glyphs[_n + 1] = x
+                glyphs[_n + 2] = y
+            else:
+                glyphs.append(word)
+                glyphs.append(x)
+                glyphs.append(y)
+            _n += 3
 
-            # 获取字体的点阵数据
-            byte_data = list(self.get_bitmap(string[char]))
-
-            # 分四种情况逐个优化
-            #   1. 黑白屏幕/无放缩
-            #   2. 黑白屏幕/放缩
-            #   3. 彩色屏幕/无放缩
-            #   4. 彩色屏幕/放缩
-            if color_type == 0:
-                byte_data = self._reverse_byte_data(byte_data) if reverse else byte_data
-                if font_size == self.font_size:
-                    display.blit(framebuf.FrameBuffer(bytearray(byte_data), font_size, font_size, framebuf.MONO_HLSB),
-                                 x, y,
-                                 alpha_color)
-                else:
-                    display.blit(
-                        framebuf.FrameBuffer(self._HLSB_font_size(byte_data, font_size, self.font_size), font_size,
-                                             font_size, framebuf.MONO_HLSB), x, y, alpha_color)
-            elif color_type == 1 and font_size == self.font_size:
-                display.blit(framebuf.FrameBuffer(self._flatten_byte_data(byte_data, palette), font_size, font_size,
-                                                  framebuf.RGB565), x, y, alpha_color)
-            elif color_type == 1 and font_size != self.font_size:
-                display.blit(framebuf.FrameBuffer(self._RGB565_font_size(byte_data, font_size, palette, self.font_size),
-                                                  font_size, font_size, framebuf.RGB565), x, y, alpha_color)
             # 英文字符半格显示
-            if ord(string[char]) < 128 and half_char:
+            if ord(word) < 128 and half_char:
                 x += font_size // 2
             else:
                 x += font_size
+        # 去掉复用列表中上一次多出的部分
+        del glyphs[_n:]
+        return glyphs
+
+    def measure(self, string: str, font_size: int = None, half_char: bool = True, auto_wrap: bool = False,
+                width: int = None, line_spacing: int = 0) -> tuple:
+        """
+        测量文字显示所需的大小，可用于居中、右对齐
+        Args:
+            string: 文字
+            font_size: 字号大小
+            half_char: 半宽显示 ASCII 字符
+            auto_wrap: 自动换行
+            width: 自动换行的宽度，为 None 时不换行
+            line_spacing: 行间距
 
-        display.show() if show else 0
+        Returns:
+            (宽, 高)
+        """
+        font_size = font_size or self.font_size
+        glyphs = self.layout(string, 0, 0, font_size, half_char, auto_wrap, width, line_spacing)
+        _width = _height = 0
+        for _i in range(0, len(glyphs), 3):
+            # 字符实际占用的宽度
+            _right = glyphs[_i + 1] + (font_size // 2 if ord(glyphs[_i]) < 128 and half_char else font_size)
+            _width = _right if _right > _width else _width
+            _height = glyphs[_i + 2] + font_size if glyphs[_i + 2] + font_size > _height else _height
+        return _width, _height
 
-    @timeit
+    @profile
     def _get_index(self, word: str) -> int:
         """
         获取索引
@@ -152,13 +637,45 @@ class BMFont:
         ESP32-C3: Function _get_index Time =  2.670ms
         """
         word_code = ord(word)
+
+        # v4: 页目录 -> 页 -> 点阵序号
+        if self.page_directory is not None:
+            if word_code > 0xFFFF:
+                return -1
+            page = (self.page_directory[(word_code >> 8) << 1] << 8) | self.page_directory[((word_code >> 8) << 1) + 1]
+            if page == 0xFFFF:
+                return -1
+            offset = (page << 9) + ((word_code & 0xFF) << 1)
+            if self.index_data is not None:
+                index = (self.index_data[offset] << 8) | self.index_data[offset + 1]
+            else:
+                self._read_into(self.index_start + offset, self.code_buffer)
+                index = (self.code_buffer[0] << 8) | self.code_buffer[1]
+            return -1 if index == 0xFFFF else index
+
+        # 索引已载入内存时直接在内存中二分查找
+        if self.index_data is not None:
+            index_data = self.index_data
+            start = 0
+            end = (len(index_data) >> 1) - 1
+            while start <= end:
+                mid = (start + end) >> 1
+                target_code = (index_data[mid << 1] << 8) | index_data[(mid << 1) + 1]
+                if word_code == target_code:
+                    return mid
+                elif word_code < target_code:
+                    end = mid - 1
+                else:
+                    start = mid + 1
+            return -1
+
         start = 0x10
         end = self.start_bitmap
 
         while start <= end:
             mid = ((start + end) // 4) * 2
-            self.font.seek(mid, 0)
-            target_code = struct.unpack(">H", self.font.read(2))[0]
+            self._read_into(mid, self.code_buffer)
+            target_code = (self.code_buffer[0] << 8) | self.code_buffer[1]
             if word_code == target_code:
                 return (mid - 16) >> 1
             elif word_code < target_code:
@@ -167,57 +684,223 @@ class BMFont:
                 start = mid + 2
         return -1
 
-    @timeit
-    def _HLSB_font_size(self, byte_data: bytearray, new_size: int, old_size: int) -> bytearray:
-        old_size = old_size
-        _temp = bytearray(new_size * ((new_size >> 3) + 1))
-        _new_index = -1
+    @profile
+    def _HLSB_font_size(self, byte_data: bytearray, new_size: int, old_size: int, _temp: bytearray = None) -> bytearray:
+        """
+        缩放 MONO_HLSB 点阵
+        Args:
+            byte_data: 原点阵
+            new_size: 新字号
+            old_size: 原字号
+            _temp: 输出缓冲区，不指定时新建
+
+        Returns:
+            缩放后的点阵，每行按字节对齐
+        """
+        _line = (new_size + 7) >> 3
+        if _temp is None:
+            _temp = bytearray(new_size * _line)
+        if ufont_viper is not None:
+            ufont_viper.hlsb_scale(byte_data, _temp, old_size, new_size)
+            return _temp
+        _map = self._scale_map(old_size, new_size)
+        _view = memoryview(_temp)
+        _new_index = 0
         for _col in range(new_size):
+            # 与上一行取自同一原始行时直接复制
+            if _col and _map[_col] == _map[_col - 1]:
+                _view[_new_index:_new_index + _line] = _view[_new_index - _line:_new_index]
+                _new_index += _line
+                continue
+            _base = _map[_col] * old_size
+            _byte = 0
             for _row in range(new_size):
-                if (_row % 8) == 0:
+                _old_index = _base + _map[_row]
+                _byte |= (byte_data[_old_index >> 3] >> (7 - (_old_index & 7)) & 1) << (7 - (_row & 7))
+                if (_row & 7) == 7:
+                    _temp[_new_index] = _byte
                     _new_index += 1
-                _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
-                _temp[_new_index] = _temp[_new_index] | (
-                        (byte_data[_old_index >> 3] >> (7 - _old_index % 8) & 1) << (7 - _row % 8))
+                    _byte = 0
+            if new_size & 7:
+                _temp[_new_index] = _byte
+                _new_index += 1
         return _temp
 
-    @timeit
-    def _RGB565_font_size(self, byte_data: bytearray, new_size: int, palette: list, old_size: int) -> bytearray:
-        old_size = old_size
-        _temp = []
-        _new_index = -1
+    @profile
+    def _RGB565_font_size(self, byte_data: bytearray, new_size: int, old_size: int, bg_color: int, color: int,
+                          _temp: bytearray = None) -> bytearray:
+        """
+        缩放点阵并展开为 RGB565
+        Args:
+            byte_data: 原点阵
+            new_size: 新字号
+            old_size: 原字号
+            bg_color: 背景色
+            color: 字体颜色
+            _temp: 输出缓冲区，不指定时新建
+
+        Returns:
+            RGB565 数据
+        """
+        if _temp is None:
+            _temp = bytearray(new_size * new_size * 2)
+        if ufont_viper is not None:
+            ufont_viper.rgb565_scale(byte_data, _temp, old_size, new_size, bg_color, color)
+            return _temp
+        _map = self._scale_map(old_size, new_size)
+        _view = memoryview(_temp)
+        _line = new_size * 2
+        _new_index = 0
         for _col in range(new_size):
+            # 与上一行取自同一原始行时直接复制
+            if _col and _map[_col] == _map[_col - 1]:
+                _view[_new_index:_new_index + _line] = _view[_new_index - _line:_new_index]
+                _new_index += _line
+                continue
+            _base = _map[_col] * old_size
             for _row in range(new_size):
-                if (_row % 8) == 0:
-                    _new_index += 1
-                _old_index = int(_col / (new_size / old_size)) * old_size + int(_row / (new_size / old_size))
-                _temp.extend(palette[byte_data[_old_index // 8] >> (7 - _old_index % 8) & 1])
-        return bytearray(_temp)
+                _old_index = _base + _map[_row]
+                _pixel = color if byte_data[_old_index >> 3] >> (7 - (_old_index & 7)) & 1 else bg_color
+                _temp[_new_index] = _pixel & 0xFF
+                _temp[_new_index + 1] = (_pixel >> 8) & 0xFF
+                _new_index += 2
+        return _temp
 
-    @timeit
-    def _flatten_byte_data(self, _byte_data: bytearray, palette: list) -> bytearray:
+    def _scale_map(self, old_size: int, new_size: int) -> bytearray:
         """
-        渲染彩色像素
+        缩放映射表
+            第 i 个元素为新坐标 i 对应的原坐标，只与两个字号有关，第一次使用时生成并缓存
+        Args:
+            old_size: 原字号
+            new_size: 新字号
+
+        Returns:
+            映射表
+        """
+        _key = (old_size, new_size)
+        _map = self.scale_maps.get(_key)
+        if _map is None:
+            _map = bytearray(new_size) if old_size <= 0x100 else array("H", range(new_size))
+            for _i in range(new_size):
+                _map[_i] = _i * old_size // new_size
+            self.scale_maps[_key] = _map
+        return _map
+
+    def _scratch(self, size: int, rgb: bool) -> tuple:
+        """
+        渲染用的缓冲区
+            每种字号/色彩模式只分配一次缓冲区和 FrameBuffer，之后反复使用
         Args:
-            _byte_data:
-            palette:
+            size: 字号
+            rgb: 是否为 RGB565
 
         Returns:
+            (缓冲区, FrameBuffer)
+        """
+        frames = self.rgb_frames if rgb else self.mono_frames
+        frame = frames.get(size)
+        if frame is None:
+            if rgb:
+                _buffer = bytearray(size * size * 2)
+                frame = (_buffer, framebuf.FrameBuffer(_buffer, size, size, framebuf.RGB565))
+            else:
+                _buffer = bytearray(size * ((size + 7) >> 3))
+                frame = (_buffer, framebuf.FrameBuffer(_buffer, size, size, framebuf.MONO_HLSB))
+            frames[size] = frame
+        return frame
+
+    @profile
+    def _run_tile(self, size: int, width: int) -> tuple:
+        """
+        直接写屏时合并同一行字符的 RGB565 缓冲区
+            宽度不超过屏幕宽度和 DIRECT_RUN_BYTES，至少为一个字符；屏幕宽度变化时重新分配
+        Args:
+            size: 字号
+            width: 屏幕宽度
+
+        Returns:
+            (缓冲区, FrameBuffer, 宽度)
+        """
+        _width = self.DIRECT_RUN_BYTES // (size * 2)
+        _width = _width if _width < width else width
+        _width = _width if _width > size else size
+        tile = self.run_frames.get(size)
+        if tile is None or tile[2] != _width:
+            _buffer = bytearray(_width * size * 2)
+            tile = (_buffer, framebuf.FrameBuffer(_buffer, _width, size, framebuf.RGB565), _width)
+            self.run_frames[size] = tile
+        return tile
 
+    def _flatten_byte_data(self, _byte_data: bytearray, bg_color: int, color: int,
+                           _temp: bytearray = None) -> bytearray:
         """
-        _temp = []
+        渲染彩色像素
+        Args:
+            _byte_data: 点阵
+            bg_color: 背景色
+            color: 字体颜色
+            _temp: 输出缓冲区，不指定时新建
+
+        Returns:
+            RGB565 数据
+        """
+        if _temp is None:
+            _temp = bytearray(len(_byte_data) * 16)
+        if ufont_viper is not None:
+            ufont_viper.rgb565_expand(_byte_data, _temp, len(_byte_data), bg_color, color)
+            return _temp
+        _index = 0
         for _byte in _byte_data:
             for _b in range(7, -1, -1):
-                _temp.extend(palette[(_byte >> _b) & 0x01])
-        return bytearray(_temp)
+                _pixel = color if (_byte >> _b) & 0x01 else bg_color
+                _temp[_index] = _pixel & 0xFF
+                _temp[_index + 1] = (_pixel >> 8) & 0xFF
+                _index += 2
+        return _temp
 
-    @timeit
+    @profile
     def _reverse_byte_data(self, _byte_data: bytearray) -> bytearray:
+        if ufont_viper is not None:
+            ufont_viper.invert(_byte_data, len(_byte_data))
+            return _byte_data
         for _pixel in range(len(_byte_data)):
             _byte_data[_pixel] = ~_byte_data[_pixel] & 0xff
         return _byte_data
 
-    @timeit
+    @profile
+    def _load_bitmap(self, word: str):
+        """
+        读取点阵，供 text 使用
+            启用点阵缓存时返回缓存中的槽位，否则直接 readinto 到 self.glyph，均不产生新的对象
+
+        Args:
+            word: 字符
+
+        Returns:
+            字符点阵，下一次调用时可能被覆盖
+        """
+        if word in self.pinned:
+            return self.pinned[word]
+        if self.bitmap_cache is not None:
+            return self.get_bitmap(word)
+        index = self._get_index(word)
+        if index == -1:
+            return self.tofu
+        if self.data is not None and not self.compress:
+            return self._bitmap_view(index)
+        self._read_bitmap(index, self.glyph)
+        return self.glyph
+
+    def _all_cached(self, string: str) -> bool:
+        """字符串中的字符是否都已常驻内存或在点阵缓存中，layout 会跳过的控制字符不需要点阵"""
+        for word in string:
+            if word in self.pinned or ord(word) < 16:
+                continue
+            if self.bitmap_cache is None or ord(word) not in self.bitmap_cache:
+                return False
+        return True
+
+    @profile
     def get_bitmap(self, word: str) -> bytes:
         """获取点阵图
 
@@ -225,25 +908,357 @@ class BMFont:
             word: 字符
 
         Returns:
-            bytes 字符点阵
+            字符点阵，启用缓存时为缓存中的 memoryview
         """
+        if word in self.pinned:
+            return self.pinned[word]
+        if self.bitmap_cache is None:
+            index = self._get_index(word)
+            if index == -1:
+                return self.tofu
+            if self.data is not None and not self.compress:
+                return self._bitmap_view(index)
+            bitmap = bytearray(self.bitmap_size)
+            self._read_bitmap(index, bitmap)
+            return bitmap
+
+        code = ord(word)
+        bitmap = self.bitmap_cache.get(code)
+        if bitmap is not None:
+            return bitmap
+        # 缺字也一并缓存，避免重复查找索引
         index = self._get_index(word)
+        bitmap = self.bitmap_cache.put(code)
         if index == -1:
-            return b'\xff\xff\xff\xff\xff\xff\xff\xff\xf0\x0f\xcf\xf3\xcf\xf3\xff\xf3\xff\xcf\xff?\xff?\xff\xff\xff' \
-                   b'?\xff?\xff\xff\xff\xff'
+            bitmap[:] = self.tofu
+        else:
+            self._read_bitmap(index, bitmap)
+        return bitmap
+
+    @profile
+    def get_bitmaps(self, string: str, max_gap: int = 8) -> dict:
+        """批量获取点阵
+            字符去重并查找索引后按文件位置排序，位置相邻的点阵合并为一次 readinto 读入同一块缓冲区
+
+        Args:
+            string: 字符串
+            max_gap: 两个点阵之间最多相隔多少个字符时合并读取，合并会多读中间的数据，但省去一次 seek/read
+
+        Returns:
+            {字符: 点阵(memoryview)}
+        """
+        bitmaps = {}
+        if self.data is not None:
+            # 内存中的字体没有 seek/read 开销，逐个取用即可
+            for word in string:
+                if word not in bitmaps and ord(word) >= 16:
+                    bitmaps[word] = self.get_bitmap(word)
+            return bitmaps
+        pending = []
+        for word in string:
+            # 换行等控制字符由 layout 处理，不查找点阵
+            if word in bitmaps or ord(word) < 16:
+                continue
+            if word in self.pinned:
+                bitmaps[word] = self.pinned[word]
+                continue
+            if self.bitmap_cache is not None:
+                bitmap = self.bitmap_cache.get(ord(word))
+                if bitmap is not None:
+                    bitmaps[word] = bitmap
+                    continue
+            index = self._get_index(word)
+            if index == -1:
+                bitmaps[word] = self.tofu
+            else:
+                # 先占位，保证重复字符只查找一次
+                bitmaps[word] = None
+                pending.append((index, word))
+        if pending:
+            # 只有全部字符都放得下时才写入点阵缓存，否则会淘汰掉本次已经命中的点阵
+            cache = self.bitmap_cache
+            if cache is not None and len(bitmaps) > cache.capacity:
+                cache = None
+            self._read_pending(pending, bitmaps, max_gap, cache)
+        return bitmaps
+
+    def _read_pending(self, pending: list, bitmaps: dict, max_gap: int, cache):
+        """
+        合并读取多个点阵
+        Args:
+            pending: [(点阵序号, 字符), ...]
+            bitmaps: 读取结果写入 {字符: 点阵}
+            max_gap: 见 get_bitmaps
+            cache: 同时写入的点阵缓存，None 则不写入
+        """
+        # 按文件位置排序后划分为若干段，每段一次读取
+        pending.sort()
+        runs = []
+        _start = _end = pending[0][0]
+        for index, _ in pending:
+            if index - _end > max_gap + 1:
+                runs.append((_start, _end))
+                _start = index
+            _end = index
+        runs.append((_start, _end))
+
+        if self.compress:
+            # 压缩字体每段一次读入压缩数据，再逐个解压到 pending 中对应的位置
+            buffer = memoryview(bytearray(len(pending) * self.bitmap_size))
+            _slot = 0
+            for _start, _end in runs:
+                _base = self._locate(_start)
+                packed = memoryview(bytearray(self._locate(_end) + self._packed_size() - _base))
+                self._read_into(self.data_start + _base, packed)
+                while _slot < len(pending) and pending[_slot][0] <= _end:
+                    _offset = _slot * self.bitmap_size
+                    self._unpack(packed[self._locate(pending[_slot][0]) - _base:],
+                                 buffer[_offset:_offset + self.bitmap_size])
+                    _slot += 1
+        else:
+            buffer = memoryview(bytearray(sum(_end - _start + 1 for _start, _end in runs) * self.bitmap_size))
+            offsets = {}
+            _offset = 0
+            for _start, _end in runs:
+                _size = (_end - _start + 1) * self.bitmap_size
+                self._read_into(self.start_bitmap + _start * self.bitmap_size, buffer[_offset:_offset + _size])
+                offsets[_start] = _offset
+                _offset += _size
+
+        _run = 0
+        for _slot, (index, word) in enumerate(pending):
+            if self.compress:
+                _offset = _slot * self.bitmap_size
+            else:
+                while index > runs[_run][1]:
+                    _run += 1
+                _offset = offsets[runs[_run][0]] + (index - runs[_run][0]) * self.bitmap_size
+            bitmap = buffer[_offset:_offset + self.bitmap_size]
+            if cache is not None:
+                _cached = cache.put(ord(word))
+                _cached[:] = bitmap
+                bitmap = _cached
+            bitmaps[word] = bitmap
+
+    def preload(self, chars: str, sizes=None, colors=None) -> int:
+        """
+        预载并常驻字符
+            点阵以及指定字号、颜色的渲染结果常驻内存，不会被淘汰；text 绘制这些字符时不再读取文件，也不再缩放和上色，
+            适合数字、单位、状态文字等需要稳定刷新时间的内容。可以多次调用，已常驻的内容不会重复生成
+
+        Args:
+            chars: 字符
+            sizes: 字号列表，默认只有原字号
+            colors: [(颜色, 背景色), ...]，只在彩色屏幕不使用调色板 blit 时生成 RGB565 结果；其余情况只需要单色点阵
+
+        Returns:
+            常驻内容占用的内存(byte)
+        """
+        sizes = sizes or (self.font_size,)
+        if not self.palette_blit and colors:
+            colors = [tuple(_color) for _color in colors]
+        else:
+            colors = ()
+        for word in chars:
+            if word not in self.pinned:
+                self.pinned[word] = bytes(self.get_bitmap(word))
+                self.pinned_bytes += self.bitmap_size
+            bitmap = self.pinned[word]
+            for font_size in sizes:
+                if (word, font_size) not in self.pinned_frames:
+                    if font_size == self.font_size:
+                        _buffer = bytearray(bitmap)
+                    else:
+                        _buffer = self._HLSB_font_size(bitmap, font_size, self.font_size)
+                    self.pinned_frames[(word, font_size)] = framebuf.FrameBuffer(
+                        _buffer, font_size, font_size, framebuf.MONO_HLSB)
+                    self.pinned_bytes += len(_buffer)
+                for color, bg_color in colors:
+                    if (word, font_size, color, bg_color) in self.pinned_frames:
+                        continue
+                    if font_size == self.font_size:
+                        _buffer = self._flatten_byte_data(bitmap, bg_color, color)
+                    else:
+                        _buffer = self._RGB565_font_size(bitmap, font_size, self.font_size, bg_color, color)
+                    self.pinned_frames[(word, font_size, color, bg_color)] = framebuf.FrameBuffer(
+                        _buffer, font_size, font_size, framebuf.RGB565)
+                    self.pinned_bytes += len(_buffer)
+        return self.pinned_bytes
+
+    def unpin(self):
+        """释放全部常驻内容"""
+        self.pinned = {}
+        self.pinned_frames = {}
+        self.pinned_bytes = 0
+
+    def _bitmap_view(self, index: int):
+        """内存中未压缩字体的点阵，直接返回切片，不复制数据"""
+        _start = self.start_bitmap + index * self.bitmap_size
+        return self.data[_start:_start + self.bitmap_size]
+
+    def _read_bitmap(self, index: int, buffer):
+        """
+        读取序号为 index 的点阵到 buffer，压缩字体在这里解压
+        Args:
+            index: 点阵序号
+            buffer: 缓冲区，大小为 bitmap_size
+        """
+        if not self.compress:
+            self._read_into(self.start_bitmap + index * self.bitmap_size, buffer)
+            return
+        _offset = self._locate(index)
+        _size = self._packed_size()
+        if _size == self.bitmap_size:
+            # 全部为原始行
+            self._read_into(self.data_start + _offset, buffer)
+            return
+        # 按最大长度读取，省去切片；多读的数据不会被解压
+        self._read_into(self.data_start + _offset, self.packed)
+        self._unpack(self.packed, buffer)
+
+    def _locate(self, index: int) -> int:
+        """
+        压缩字体中序号为 index 的点阵相对压缩数据开始位置的偏移量，同时把它的行标记复制到 self.mask
+            块表记录了每块第一个点阵的偏移量，加上块内之前各点阵的长度(由行标记计算)即可
+        """
+        _block = index // self.block_glyphs
+        _slot = index - _block * self.block_glyphs
+        if self.table_data is not None:
+            _table = self.table_data
+            _pos = _block * self.block_size
+        else:
+            _table = self.block
+            _pos = 0
+            self._read_into(self.table_start + _block * self.block_size, _table)
+        _offset = (_table[_pos] << 16) | (_table[_pos + 1] << 8) | _table[_pos + 2]
+        _pos += 3
+        _mask_size = self.mask_size
+        _rows = 0
+        for _i in range(_pos, _pos + _slot * _mask_size):
+            _rows += _BITS[_table[_i]]
+        # 之前的点阵共 _slot * 行数 行，其中 _rows 行为 1 byte 的字典行号
+        _offset += _slot * self.bitmap_size - _rows * (self.row_size - 1)
+        _pos += _slot * _mask_size
+        _mask = self.mask
+        for _i in range(_mask_size):
+            _mask[_i] = _table[_pos + _i]
+        return _offset
+
+    def _packed_size(self) -> int:
+        """self.mask 对应的点阵压缩后的长度"""
+        _rows = 0
+        for _byte in self.mask:
+            _rows += _BITS[_byte]
+        return self.bitmap_size - _rows * (self.row_size - 1)
+
+    def _unpack(self, packed, buffer):
+        """
+        行字典解压
+            self.mask 中每行 1 bit: 1 表示该行为 1 byte 字典行号，0 表示原始行数据
+        Args:
+            packed: 压缩数据，从点阵开始位置起
+            buffer: 输出缓冲区，大小为 bitmap_size
+        """
+        if ufont_viper is not None:
+            ufont_viper.row_unpack(packed, buffer, self.mask, self.row_dict, self.bitmap_size, self.row_size)
+            return
+        _size = self.row_size
+        _dict = self.row_dict
+        _mask = self.mask
+        _in = 0
+        _row = 0
+        for _out in range(0, self.bitmap_size, _size):
+            if _mask[_row >> 3] >> (7 - (_row & 7)) & 1:
+                _code = packed[_in] * _size
+                _in += 1
+                for _i in range(_size):
+                    buffer[_out + _i] = _dict[_code + _i]
+            else:
+                for _i in range(_size):
+                    buffer[_out + _i] = packed[_in + _i]
+                _in += _size
+            _row += 1
 
-        self.font.seek(self.start_bitmap + index * self.bitmap_size, 0)
-        return self.font.read(self.bitmap_size)
+    def _read_into(self, offset: int, buffer):
+        """
+        从字体文件 offset 处读取数据填满 buffer
+        Args:
+            offset: 文件位置
+            buffer: 缓冲区
+        """
+        if self.data is not None:
+            # 超出末尾的部分保持不变，只有压缩字体按最大长度读取最后一个点阵时会发生
+            _size = min(len(buffer), len(self.data) - offset)
+            buffer[:_size] = self.data[offset:offset + _size]
+        else:
+            self.font.seek(offset, 0)
+            self.font.readinto(buffer)
+        self.bytes_read += len(buffer)
+
+    def stats(self) -> dict:
+        """
+        性能统计
+            需要在导入 ufont 前设置 `PROFILE = True`，否则只有读取字节数
 
-    @timeit
-    def __init__(self, font_file):
+        Returns:
+            {函数名: {"calls", "total_us", "min_us", "max_us", "alloc"}, ..., "bytes_read": 读取字体文件的字节数}
+            函数的统计为所有 BMFont 实例共用，耗时包含其调用的其他函数
+        """
+        result = {}
+        for _name, _stat in PROFILE_STATS.items():
+            result[_name] = {"calls": _stat[0], "total_us": _stat[1], "min_us": _stat[2], "max_us": _stat[3],
+                             "alloc": _stat[4]}
+        result["bytes_read"] = self.bytes_read
+        return result
+
+    def reset_stats(self):
+        """清空性能统计"""
+        for _stat in PROFILE_STATS.values():
+            for _i in range(len(_stat)):
+                _stat[_i] = 0
+        self.bytes_read = 0
+
+    def cache_info(self) -> dict:
+        """
+        缓存统计
+        Returns:
+            点阵缓存的 hits/misses/evictions 等计数，启用渲染缓存时另有 `frame` 项，有常驻字符时另有 `pinned` 项，
+            未启用缓存时返回空字典
+        """
+        info = self.bitmap_cache.info() if self.bitmap_cache is not None else {}
+        if self.frame_cache is not None:
+            info["frame"] = self.frame_cache.info()
+        if self.pinned:
+            info["pinned"] = {"chars": len(self.pinned), "frames": len(self.pinned_frames), "bytes": self.pinned_bytes}
+        return info
+
+    @profile
+    def __init__(self, font_file, index_cache: int = 0, bitmap_cache: int = 0, frame_cache: int = 0,
+                 palette_blit: bool = True):
         """
         Args:
-            font_file: 字体文件路径
+            font_file: 字体来源
+                文件路径(str)
+                已打开的文件或其他支持 seek/readinto 的对象，例如 `BlockFile(esp32.Partition)`
+                bytes/bytearray/memoryview 等支持缓冲区协议的对象，例如冻结在固件中的 bytes、CPython 的 mmap；
+                    索引和点阵直接在内存中切片，不再 seek/read，未压缩时点阵缓存无效
+            index_cache: 索引缓存上限(byte)，索引表不超过该大小时一次性载入内存，查找时不再读取文件；0 则不缓存
+            bitmap_cache: 点阵缓存大小(byte)，按 LRU 淘汰；0 则不缓存
+            frame_cache: 彩色渲染缓存大小(byte)，缓存按 (字符, 字号, 颜色, 背景色) 渲染好的 RGB565 FrameBuffer；0 则不缓存
+                         只在 palette_blit 未启用(指定 False 或固件不支持)时生效
+            palette_blit: 彩色屏幕使用调色板 blit 单色点阵，不再逐像素展开为 RGB565；固件不支持时自动回退
         """
         self.font_file = font_file
         # 载入字体文件
-        self.font = open(font_file, "rb")
+        #   self.data 不为 None 时字体位于内存中
+        self.font = None
+        self.data = None
+        if isinstance(font_file, str):
+            self.font = open(font_file, "rb")
+        elif hasattr(font_file, "readinto"):
+            self.font = font_file
+        else:
+            self.data = memoryview(font_file)
         # 获取字体文件信息
         #   字体文件信息大小 16 byte ,按照顺序依次是
         #       文件标识 2 byte
@@ -252,15 +1267,21 @@ class BMFont:
         #       位图开始字节 3 byte
         #       字号 1 byte
         #       单字点阵字节大小 1 byte
-        #       保留 7 byte
-        self.bmf_info = self.font.read(16)
+        #       v3: 保留 2 byte
+        #       v4: 页数 2 byte
+        #       压缩方式 1 byte
+        #       字符数 3 byte(仅压缩时使用)
+        #       保留 1 byte
+        self.bytes_read = 0
+        self.bmf_info = bytearray(16)
+        self._read_into(0, self.bmf_info)
 
         # 判断字体是否正确
         #   文件头和常用的图像格式 BMP 相同，需要添加版本验证来辅助验证
         if self.bmf_info[0:2] != b"BM":
-            raise TypeError("字体文件格式不正确: " + font_file)
+            raise TypeError("字体文件格式不正确: " + str(font_file))
         self.version = self.bmf_info[2]
-        if self.version != 3:
+        if self.version not in (3, 4):
             raise TypeError("字体文件版本不正确: " + str(self.version))
 
         # 映射方式
@@ -276,3 +1297,241 @@ class BMFont:
         # 点阵所占字节
         #   用来定位字体数据位置
         self.bitmap_size = self.bmf_info[8]
+        # 压缩方式
+        #   0: 不压缩，点阵按序号紧密排列
+        #   1: 行字典压缩，通过块表定位点阵，读取后逐行解压
+        self.compress = self.bmf_info[11]
+        if self.compress not in (0, 1):
+            raise TypeError("不支持的压缩方式: " + str(self.compress))
+
+        # 索引表
+        #   v3: 位于 0x10 到位图开始字节之间，按编码升序排列，每个字符 2 byte(大端)，需要二分查找
+        #   v4: 0x10 开始为 256 项的页目录(编码高字节 -> 页号，常驻内存)，之后为各页 256 项的点阵序号(编码低字节 -> 序号)，
+        #       查找一个字符最多读取一次文件
+        #   载入内存后 `_get_index` 不再需要逐次 seek/read，内存不足时回退到读取文件
+        self.page_directory = None
+        self.index_start = 0x10
+        if self.version == 4:
+            self.index_start = 0x210
+            if self.data is not None:
+                self.page_directory = self.data[0x10:0x210]
+            else:
+                self.page_directory = bytearray(512)
+                self._read_into(0x10, self.page_directory)
+        self.index_data = None
+        index_size = self.start_bitmap - self.index_start
+        if self.data is not None:
+            self.index_data = self.data[self.index_start:self.start_bitmap]
+        elif 0 < index_size <= index_cache:
+            self.index_data = bytearray(index_size)
+            self._read_into(self.index_start, self.index_data)
+
+        # 行字典压缩
+        #   位图开始字节处依次为 每行字节数、字典行数、每块字符数(各 1 byte)、字典、块表和压缩数据，格式见 tools/bmf.py
+        #   字典常驻内存；块表不超过 index_cache 时同样载入内存
+        self.table_data = None
+        if self.compress:
+            _info = bytearray(3)
+            self._read_into(self.start_bitmap, _info)
+            self.row_size = _info[0]
+            self.block_glyphs = _info[2]
+            self.row_dict = bytearray(_info[1] * self.row_size)
+            self._read_into(self.start_bitmap + 3, self.row_dict)
+            self.mask_size = (self.bitmap_size // self.row_size + 7) >> 3
+            self.block_size = 3 + self.block_glyphs * self.mask_size
+            self.table_start = self.start_bitmap + 3 + len(self.row_dict)
+            _count = struct.unpack(">I", b'\x00' + self.bmf_info[12:15])[0]
+            table_size = (_count + self.block_glyphs - 1) // self.block_glyphs * self.block_size
+            self.data_start = self.table_start + table_size
+            if self.data is not None:
+                self.table_data = self.data[self.table_start:self.data_start]
+            elif table_size <= index_cache:
+                self.table_data = bytearray(table_size)
+                self._read_into(self.table_start, self.table_data)
+            # 读取块表、行标记和压缩数据用的缓冲区，压缩数据最长为全部是原始行
+            self.block = bytearray(self.block_size)
+            self.mask = bytearray(self.mask_size)
+            self.packed = bytearray(self.bitmap_size)
+
+        # 点阵缓存
+        #   内存中未压缩的字体直接切片，不需要缓存
+        if self.data is not None and not self.compress:
+            bitmap_cache = 0
+        self._init_render(bitmap_cache, frame_cache, palette_blit)
+
+    def _init_render(self, bitmap_cache: int, frame_cache: int, palette_blit: bool):
+        """初始化缓存和渲染用的缓冲区，需要先确定 font_size 和 bitmap_size"""
+        self.bitmap_cache = GlyphCache(bitmap_cache, self.bitmap_size) if bitmap_cache >= self.bitmap_size else None
+
+        # 彩色渲染缓存
+        self.frame_cache = FrameCache(frame_cache) if frame_cache > 0 else None
+
+        # 调色板 blit
+        #   需要 FrameBuffer.blit 支持 palette 参数，不支持时回退到逐像素展开
+        #   启用时不会使用彩色渲染缓存
+        self.palette = framebuf.FrameBuffer(bytearray(4), 2, 1, framebuf.RGB565)
+        self.palette_blit = palette_blit
+        if palette_blit:
+            try:
+                framebuf.FrameBuffer(bytearray(2), 1, 1, framebuf.RGB565).blit(
+                    framebuf.FrameBuffer(bytearray(1), 1, 1, framebuf.MONO_HLSB), 0, 0, -1, self.palette)
+            except TypeError:
+                self.palette_blit = False
+
+        # 缺字点阵，字号不是 16 时用实心方块代替，保证与其他点阵大小一致
+        self.tofu = self.TOFU if len(self.TOFU) == self.bitmap_size else b'\xff' * self.bitmap_size
+
+        # 常驻字符，见 preload
+        #   字符 -> 点阵; (字符, 字号) -> 单色 FrameBuffer; (字符, 字号, 颜色, 背景色) -> RGB565 FrameBuffer
+        self.pinned = {}
+        self.pinned_frames = {}
+        self.pinned_bytes = 0
+
+        # 渲染用的缓冲区
+        #   text 在这些缓冲区上完成读取、缩放和上色，稳定运行时不再申请内存
+        self.code_buffer = bytearray(2)
+        self.glyph = bytearray(self.bitmap_size)
+        self.glyph_frame = framebuf.FrameBuffer(self.glyph, self.font_size, self.font_size, framebuf.MONO_HLSB)
+        # 字号 -> (缓冲区, FrameBuffer)
+        self.mono_frames = {}
+        self.rgb_frames = {}
+        self.run_frames = {}
+        # text 的排版结果
+        self.glyph_list = []
+
+        # 缩放映射表
+        #   (原字号, 新字号) -> 坐标映射表，界面通常只使用少数几种字号，生成一次后反复使用
+        self.scale_maps = {}
+
+
+class FontChain(BMFont):
+    """
+    多字体回退
+        按顺序在多个字体中查找字符，使用第一个包含该字符的字体，例如 [ASCII 小字体, 完整中文字体, 符号字体]；
+        每个字符由哪个字体提供会被记录下来，之后不再逐个字体查找。
+        可以代替 BMFont 传给 text/layout/measure 等方法，所有字体的字号和点阵大小需要一致
+    """
+
+    def __init__(self, fonts, bitmap_cache: int = 0, frame_cache: int = 0, palette_blit: bool = True):
+        """
+        Args:
+            fonts: BMFont 列表，按优先级排列；各字体的 index_cache 仍然有效，点阵缓存请在 FontChain 上设置
+            bitmap_cache: 点阵缓存大小(byte)，同 BMFont
+            frame_cache: 彩色渲染缓存大小(byte)，同 BMFont，只在 palette_blit 未启用时生效
+            palette_blit: 同 BMFont
+        """
+        if not fonts:
+            raise TypeError("至少需要一个字体")
+        self.fonts = list(fonts)
+        self.font_file = None
+        self.font = None
+        self.data = None
+        self.compress = 0
+        self.font_size = self.fonts[0].font_size
+        self.bitmap_size = self.fonts[0].bitmap_size
+        for font in self.fonts:
+            if font.font_size != self.font_size or font.bitmap_size != self.bitmap_size:
+                raise TypeError("字体的字号或点阵大小不一致: " + str(font.font_file))
+
+        # 字符编码 -> (字体, 点阵序号)，所有字体都缺字时为 (None, -1)
+        self.owners = {}
+        self._init_render(bitmap_cache, frame_cache, palette_blit)
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(font.bytes_read for font in self.fonts)
+
+    @bytes_read.setter
+    def bytes_read(self, value: int):
+        for font in self.fonts:
+            font.bytes_read = value
+
+    def _resolve(self, word: str) -> tuple:
+        """
+        查找提供该字符的字体
+        Returns:
+            (字体, 点阵序号)，所有字体都缺字时为 (None, -1)
+        """
+        code = ord(word)
+        owner = self.owners.get(code)
+        if owner is None:
+            owner = (None, -1)
+            for font in self.fonts:
+                index = font._get_index(word)
+                if index != -1:
+                    owner = (font, index)
+                    break
+            self.owners[code] = owner
+        return owner
+
+    def _get_index(self, word: str) -> int:
+        return self._resolve(word)[1]
+
+    @profile
+    def _load_bitmap(self, word: str):
+        if word in self.pinned:
+            return self.pinned[word]
+        if self.bitmap_cache is not None:
+            return self.get_bitmap(word)
+        font, index = self._resolve(word)
+        if font is None:
+            return self.tofu
+        if font.data is not None and not font.compress:
+            return font._bitmap_view(index)
+        font._read_bitmap(index, self.glyph)
+        return self.glyph
+
+    def get_bitmap(self, word: str) -> bytes:
+        if word in self.pinned:
+            return self.pinned[word]
+        if self.bitmap_cache is not None:
+            bitmap = self.bitmap_cache.get(ord(word))
+            if bitmap is not None:
+                return bitmap
+        font, index = self._resolve(word)
+        if self.bitmap_cache is not None:
+            bitmap = self.bitmap_cache.put(ord(word))
+            if font is None:
+                bitmap[:] = self.tofu
+            else:
+                font._read_bitmap(index, bitmap)
+            return bitmap
+        if font is None:
+            return self.tofu
+        if font.data is not None and not font.compress:
+            return font._bitmap_view(index)
+        bitmap = bytearray(self.bitmap_size)
+        font._read_bitmap(index, bitmap)
+        return bitmap
+
+    @profile
+    def get_bitmaps(self, string: str, max_gap: int = 8) -> dict:
+        """批量获取点阵，按字体分组后由各字体合并读取，参数同 BMFont.get_bitmaps"""
+        bitmaps = {}
+        # 字体 -> [(点阵序号, 字符), ...]
+        groups = {}
+        for word in string:
+            if word in bitmaps or ord(word) < 16:
+                continue
+            if word in self.pinned:
+                bitmaps[word] = self.pinned[word]
+                continue
+            if self.bitmap_cache is not None:
+                bitmap = self.bitmap_cache.get(ord(word))
+                if bitmap is not None:
+                    bitmaps[word] = bitmap
+                    continue
+            font, index = self._resolve(word)
+            if font is None:
+                bitmaps[word] = self.tofu
+            elif font.data is not None and not font.compress:
+                bitmaps[word] = font._bitmap_view(index)
+            else:
+                bitmaps[word] = None
+                groups.setdefault(font, []).append((index, word))
+        cache = self.bitmap_cache
+        if cache is not None and len(bitmaps) > cache.capacity:
+            cache = None
+        for font, pending in groups.items():
+            font._read_pending(pending, bitmaps, max_gap, cache)
+        return bitmaps
@@ -0,0 +1,172 @@
+"""
+ufont 的 viper 加速实现
+
+与 ufont.py 放在同一目录即可，ufont 导入时会自动启用；
+固件不支持 viper 代码发射器(或在 CPython 下)时导入失败，ufont 自动回退到纯 Python 实现。
+
+所有缩放均使用整数累加步进代替浮点除法，结果与 `原坐标 * 原字号 // 新字号` 一致。
+RGB565 输出按本机字节序写入 uint16，与 FrameBuffer.pixel 的存储方式相同。
+"""
+import micropython
+
+
+@micropython.viper
+def hlsb_scale(src, dst, old_size: int, new_size: int):
+    """
+    MONO_HLSB 点阵最近邻缩放
+    Args:
+        src: 原点阵，按位连续存放
+        dst: 输出缓冲区，至少 new_size * ((new_size + 7) >> 3) byte，每行按字节对齐
+        old_size: 原字号
+        new_size: 新字号
+    """
+    s = ptr8(src)
+    d = ptr8(dst)
+    i = 0
+    src_y = 0
+    err_y = 0
+    y = 0
+    while y < new_size:
+        base = src_y * old_size
+        src_x = 0
+        err_x = 0
+        b = 0
+        x = 0
+        while x < new_size:
+            bit = base + src_x
+            if (s[bit >> 3] >> (7 - (bit & 7))) & 1:
+                b |= 0x80 >> (x & 7)
+            x += 1
+            if (x & 7) == 0:
+                d[i] = b
+                i += 1
+                b = 0
+            err_x += old_size
+            while err_x >= new_size:
+                err_x -= new_size
+                src_x += 1
+        if new_size & 7:
+            d[i] = b
+            i += 1
+        y += 1
+        err_y += old_size
+        while err_y >= new_size:
+            err_y -= new_size
+            src_y += 1
+
+
+@micropython.viper
+def rgb565_scale(src, dst, old_size: int, new_size: int, bg: int, fg: int):
+    """
+    MONO_HLSB 点阵最近邻缩放并展开为 RGB565
+    Args:
+        src: 原点阵，按位连续存放
+        dst: 输出缓冲区，至少 new_size * new_size * 2 byte
+        old_size: 原字号
+        new_size: 新字号
+        bg: 背景色
+        fg: 字体颜色
+    """
+    s = ptr8(src)
+    d = ptr16(dst)
+    i = 0
+    src_y = 0
+    err_y = 0
+    y = 0
+    while y < new_size:
+        base = src_y * old_size
+        src_x = 0
+        err_x = 0
+        x = 0
+        while x < new_size:
+            bit = base + src_x
+            if (s[bit >> 3] >> (7 - (bit & 7))) & 1:
+                d[i] = fg
+            else:
+                d[i] = bg
+            i += 1
+            x += 1
+            err_x += old_size
+            while err_x >= new_size:
+                err_x -= new_size
+                src_x += 1
+        y += 1
+        err_y += old_size
+        while err_y >= new_size:
+            err_y -= new_size
+            src_y += 1
+
+
+@micropython.viper
+def rgb565_expand(src, dst, n: int, bg: int, fg: int):
+    """
+    将 n byte 的 MONO_HLSB 数据展开为 RGB565
+    Args:
+        src: 原点阵
+        dst: 输出缓冲区，至少 n * 16 byte
+        n: 原点阵字节数
+        bg: 背景色
+        fg: 字体颜色
+    """
+    s = ptr8(src)
+    d = ptr16(dst)
+    i = 0
+    j = 0
+    while j < n:
+        b = s[j]
+        m = 0x80
+        while m:
+            if b & m:
+                d[i] = fg
+            else:
+                d[i] = bg
+            i += 1
+            m >>= 1
+        j += 1
+
+
+@micropython.viper
+def invert(buf, n: int):
+    """逐字节取反"""
+    b = ptr8(buf)
+    i = 0
+    while i < n:
+        b[i] = b[i] ^ 0xFF
+        i += 1
+
+
+@micropython.viper
+def row_unpack(src, dst, mask, table, n: int, size: int):
+    """
+    行字典解压
+
+    Args:
+        src: 压缩数据
+        dst: 输出缓冲区，至少 n byte
+        mask: 行标记，每行 1 bit(高位在前)，1 为字典行号，0 为原始行
+        table: 行字典
+        n: 点阵字节数
+        size: 每行字节数
+    """
+    s = ptr8(src)
+    d = ptr8(dst)
+    m = ptr8(mask)
+    t = ptr8(table)
+    i = 0
+    j = 0
+    row = 0
+    while j < n:
+        k = 0
+        if (m[row >> 3] >> (7 - (row & 7))) & 1:
+            c = s[i] * size
+            i += 1
+            while k < size:
+                d[j + k] = t[c + k]
+                k += 1
+        else:
+            while k < size:
+                d[j + k] = s[i + k]
+                k += 1
+            i += size
+        j += size
+        row += 1